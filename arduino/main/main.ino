@@ -4,6 +4,7 @@
 #include <semphr.h>
 
 //#define DEBUGP   // Uncomment statement to enable debugging mode
+//#define BINARY_PAYLOAD   // Uncomment statement to send samples packed (see rpi/payload.py) instead of as CSV
 
 // Print macros
 #ifdef DEBUGP
@@ -25,6 +26,7 @@
 #define SFRAME_RR       0x00
 #define SFRAME_RNR      0x02
 #define SFRAME_REJ      0x01
+#define SFRAME_SREJ     0x03
 const byte final2Bits_HFrame = 0x03;
 const byte final2Bits_SFrame = 0x01;
 
@@ -36,6 +38,8 @@ const byte final2Bits_SFrame = 0x01;
 #define BUFFER_SIZE       16
 #define MIN_IFRAME_LENGTH 50
 #define MAX_IFRAME_LENGTH 160                         // Calculated Max length is 154
+#define PAYLOAD_VERSION   1                           // First byte of binary payloads. CSV payloads start with '-' or a digit
+#define PAYLOAD_LEN       47                          // Version, 18 int16 IMU values, 3 uint16 and 1 uint32 power fields
 
 #ifndef pdMSTOTICKS
 #define pdMS_TO_TICKS( xTimeInMs ) ( ( TickType_t ) ( ( ( TickType_t ) ( xTimeInMs ) * ( TickType_t ) configTICK_RATE_HZ ) / ( TickType_t ) 1000 ) )
@@ -49,6 +53,7 @@ uint8_t lastSent = 0;                // keeps track of the current last frame pu
 uint8_t lastACK = BUFFER_SIZE - 1;   // keeps track of the last acknowledged frame by the RPi. Set to BUFFER_SIZE - 1 to account for first ACK case after handshake.
 uint8_t freeBuffer = BUFFER_SIZE;   // if = 0, stop reading new values
 char send_buf[BUFFER_SIZE][MAX_IFRAME_LENGTH];
+uint32_t send_qmsg[BUFFER_SIZE];    // TaskSend queue message of each frame in send_buf, kept for retransmission
 
 uint8_t buf_idx = 0;
 
@@ -185,6 +190,16 @@ uint16_t writeEscaped(char* buf, uint16_t write_start, char* data, uint8_t data_
   return pos - write_start;
 }
 
+uint8_t packLE(char* buf, uint8_t pos, uint32_t value, uint8_t n_bytes) {
+  // Writes the lowest n_bytes of value to buf at pos, least significant byte first.
+  // Returns the position after the last byte written.
+  for (uint8_t i = 0; i < n_bytes; i++) {
+    buf[pos++] = value & 0xFF;
+    value >>= 8;
+  }
+  return pos;
+}
+
 void TaskReadSensors(void *pvParameters) {
   uint16_t buf_len, checksum;
   uint8_t controlBytes_len;    // Calculates control_bytes length
@@ -195,6 +210,10 @@ void TaskReadSensors(void *pvParameters) {
   char controlBuffer[5];           // a buffer to store the control_bytes when they are escaped.
   char voltStr[8], currentStr[8], powerStr[8], energyStr[8];
   char control_chars[3], check_chars[3];
+#ifdef BINARY_PAYLOAD
+  char packed[2 + PAYLOAD_LEN];    // Control bytes and payload before escaping, for the checksum
+  uint8_t packed_len;
+#endif
   unsigned long currentTime, timeDelta;  // startTime defined globallly
   uint32_t qmsg;
 
@@ -247,10 +266,12 @@ void TaskReadSensors(void *pvParameters) {
     powerVal = voltVal * currentVal;                                          // mW
     energyVal = energyVal + ((powerVal / 1000) * ((float) timeDelta / 1000)); // Joules
 
+#ifndef BINARY_PAYLOAD
     dtostrf(voltVal, 0, 2, voltStr);
     dtostrf(currentVal, 0, 0, currentStr);
     dtostrf(powerVal, 0, 0, powerStr);
     dtostrf(energyVal, 0, 1, energyStr);
+#endif
 
     // Package into I-frame
     buf_len = controlBytes_len = 0;
@@ -269,6 +290,29 @@ void TaskReadSensors(void *pvParameters) {
                        "%c%c",
                        control_chars[0], control_chars[1]);
 
+#ifdef BINARY_PAYLOAD
+    // Packed sensor reading and telemetry, little-endian. Must be escaped since any byte may be 7D or 7E
+    packed[0] = control_chars[0];
+    packed[1] = control_chars[1];
+    packed_len = 2;
+    packed[packed_len++] = PAYLOAD_VERSION;
+    for (uint8_t i = 0; i < NUM_GY521; i++) {
+      packed_len = packLE(packed, packed_len, AcX[i], 2);
+      packed_len = packLE(packed, packed_len, AcY[i], 2);
+      packed_len = packLE(packed, packed_len, AcZ[i], 2);
+      packed_len = packLE(packed, packed_len, GyX[i], 2);
+      packed_len = packLE(packed, packed_len, GyY[i], 2);
+      packed_len = packLE(packed, packed_len, GyZ[i], 2);
+    }
+    packed_len = packLE(packed, packed_len, (uint32_t) (voltVal * 100 + 0.5), 2);     // 10 mV
+    packed_len = packLE(packed, packed_len, (uint32_t) (currentVal + 0.5), 2);        // mA
+    packed_len = packLE(packed, packed_len, (uint32_t) (powerVal + 0.5), 2);          // mW
+    packed_len = packLE(packed, packed_len, (uint32_t) (energyVal * 1000 + 0.5), 4);  // mJ
+    buf_len += writeEscaped(send_buf[buf_idx], buf_len, &packed[2], packed_len - 2);
+
+    // Checksum over the control bytes and payload before escaping
+    checksum = crc16(packed, packed_len);
+#else
     // Sensor reading - no need to escape since str won't contain ascii 7D={ or 7E=~
     for (uint8_t i = 0; i < NUM_GY521; i++) {
       buf_len += sprintf(send_buf[buf_idx] + buf_len,
@@ -284,6 +328,7 @@ void TaskReadSensors(void *pvParameters) {
 
     // Checksum
     checksum = crc16(&send_buf[buf_idx][2], buf_len - 2);   // Exclude the NULL characters in front
+#endif
     check_chars[0] = checksum >> 8;
     check_chars[1] = checksum & 0xFF;
     check_chars[2] = '\0';
@@ -309,6 +354,7 @@ void TaskReadSensors(void *pvParameters) {
     qmsg = (unsigned long)(4 - controlBytes_len) << 24 | (unsigned long)buf_idx << 16 | buf_len;   // 1 byte offset, 1 byte index, 2 bytes len
     DEBUG_PRINT("offset is "); DEBUG_PRINTLN(4 - controlBytes_len);
 
+    send_qmsg[buf_idx] = qmsg;
     freeBuffer -= 1;
     buf_idx = (buf_idx + 1) & (BUFFER_SIZE - 1);
     send_seq = (send_seq + 1) & 0x7F;             // Keeps the sequence number between 0 - 127 to fit into control_byte
@@ -404,7 +450,13 @@ void TaskRecv(void *pvParameters) {
         // Trim to only frame[3:2]]. If true, RPi rejected the frame sent by Arduino, must resend
         uint8_t RPiReceive = (buf[1] >> 1) & (BUFFER_SIZE - 1);
         byte SFrameType = (buf[2] >> 2) & 0b11;
-        if (SFrameType == SFRAME_REJ) {
+        if (SFrameType == SFRAME_SREJ) {
+          // Resend only the frame with send seq N(R). Frame with send seq s is in send_buf[(s - 1) % BUFFER_SIZE]
+          uint8_t srejIdx = ((buf[1] >> 1) - 1) & (BUFFER_SIZE - 1);
+          DEBUG_PRINT("RPi has not received frame "); DEBUG_PRINT(buf[1] >> 1); DEBUG_PRINTLN(", resending it");
+          xQueueSend(xSerialSendQueue, &send_qmsg[srejIdx], 0);   // Don't block TaskRecv. If the queue is full the RPi gives up on the frame
+        }
+        else if (SFrameType == SFRAME_REJ) {
           DEBUG_PRINT("RPi has not received all frames, resending frames "); DEBUG_PRINT(RPiReceive); DEBUG_PRINT(" to "); DEBUG_PRINTLN(lastSent);
           if (RPiReceive > lastSent) {
             for (uint8_t i = RPiReceive; i < BUFFER_SIZE; i++) {
@@ -0,0 +1,113 @@
+"""
+Micro-benchmarks for the framing hot path.
+`python bench_framing.py` prints the time per call of each implementation, and
+the memory held by 10k received frames in each representation.
+"""
+
+import timeit
+import tracemalloc
+
+from framing import START_STOP_BYTE, ESCAPE_BYTE, SFRAME_BYTES, Frame, FramePool, IFrame, SFrame, crc16xmodem
+
+
+def escape_loop(bytes_):
+    """Per-byte escape loop that Frame.escape replaced. Kept for comparison."""
+    escaped = []
+    for index, byte in enumerate(bytes_):
+        if (byte == START_STOP_BYTE
+          and not (index == 0 or index == len(bytes_)-1)):
+            escaped.append(ESCAPE_BYTE)
+            escaped.append(94)
+        elif (byte == ESCAPE_BYTE
+          and not (index == 0 or index == len(bytes_)-1)):
+            escaped.append(ESCAPE_BYTE)
+            escaped.append(93)
+        else:
+            escaped.append(byte)
+
+    return bytes(escaped)
+
+
+def unescape_loop(bytes_):
+    """Per-byte unescape loop that Frame.unescape replaced. Kept for comparison."""
+    escape_state = 0
+    unescaped = []
+    for index, byte in enumerate(bytes_):
+        if (byte == ESCAPE_BYTE and escape_state == 0
+          and not (index == 0 or index == len(bytes_)-1)):
+            escape_state = 1
+        elif escape_state == 1:
+            if byte == 94:
+                unescaped.append(START_STOP_BYTE)
+            elif byte == 93:
+                unescaped.append(ESCAPE_BYTE)
+            else:
+                raise ValueError('Byte {} escaped when it should not be'.format(byte))
+            escape_state = 0
+        else:
+            unescaped.append(byte)
+            escape_state = 0
+
+    return bytes(unescaped)
+
+
+def crc16xmodem_loop(data, crc=0):
+    """Bitwise CRC-16/XMODEM, as a reference for crc16xmodem."""
+    for byte in data:
+        crc ^= byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021 if crc & 0x8000 else crc << 1) & 0xFFFF
+    return crc
+
+
+def bench(label, stmt, number, repeat=5):
+    """Prints the best of repeat runs, which is least affected by other load."""
+    secs = min(timeit.repeat(stmt, number=number, repeat=repeat))
+    print('{:<40}{:>10.2f} us/call'.format(label, secs / number * 1e6))
+
+
+def bench_memory(label, parse, received):
+    """Prints the memory still allocated after parsing and keeping every frame."""
+    tracemalloc.start()
+    frames = [parse(bytes_) for bytes_ in received]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('{:<40}{:>10.1f} KiB / {}k frames'.format(label, size / 1024, len(frames) // 1000))
+
+
+# Typical sensor payload: 22 comma-separated values, ~150 bytes
+SAMPLE = b'-1234,567,16384,-250,13,-7,' * 5 + b'4.98,0.512,2.549,1234.56'
+
+
+if __name__ == '__main__':
+    number = 20000
+    plain = IFrame(5, 9, SAMPLE).raw
+    special = IFrame(5, 9, SAMPLE.replace(b',', b'\x7E', 10).replace(b'-', b'\x7D', 5)).raw
+
+    for name, raw in (('no special bytes', plain), ('15 special bytes', special)):
+        escaped = Frame.escape(raw)
+        assert escape_loop(raw) == escaped and unescape_loop(escaped) == raw
+        print('{} ({} bytes):'.format(name, len(raw)))
+        bench('  escape (loop)', lambda: escape_loop(raw), number)
+        bench('  escape (Frame.escape)', lambda: Frame.escape(raw), number)
+        bench('  unescape (loop)', lambda: unescape_loop(escaped), number)
+        bench('  unescape (Frame.unescape)', lambda: Frame.unescape(escaped), number)
+
+    raw = IFrame(5, 9, SAMPLE).raw[1:-3]
+    assert crc16xmodem_loop(raw) == crc16xmodem(raw)
+    print('checksum ({} bytes):'.format(len(raw)))
+    bench('  crc16xmodem (bitwise loop)', lambda: crc16xmodem_loop(raw), number // 10)
+    bench('  crc16xmodem', lambda: crc16xmodem(raw), number)
+
+    print('RR frame:')
+    bench('  SFrame(seq, RR).bytes', lambda: SFrame(42, SFrame.Type.RR).bytes, number)
+    bench('  SFRAME_BYTES[RR][seq]', lambda: SFRAME_BYTES[SFrame.Type.RR][42], number)
+
+    received = [IFrame(0, seq % 128, SAMPLE).bytes for seq in range(10000)]
+    print('receive ({} byte frames):'.format(len(received[0])))
+    bench('  Frame.make_frame', lambda: Frame.make_frame(received[0]), number)
+    bench('  Frame.parse', lambda: Frame.parse(received[0]), number)
+    pool = FramePool()
+    bench('  Frame.parse with FramePool', lambda: pool.put(Frame.parse(received[0], pool.get())), number)
+    bench_memory('  Frame.make_frame', Frame.make_frame, received)
+    bench_memory('  Frame.parse', Frame.parse, received)
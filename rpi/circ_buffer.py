@@ -1,14 +1,20 @@
-import asyncio
+def _is_power_of_2(n):
+    return n != 0 and n & (n - 1) == 0
 
 
 class CircularBuffer:
-    def __init__(self, maxlen):
+    def __init__(self, maxlen, max_capacity=None):
         """Self-expanding circular buffer.
         maxlen must be a power of 2. This enables use of bitmask instead of
         expensive modulo operations.
+        If max_capacity (also a power of 2) is given, the buffer never grows past
+        it. Writes that do not fit raise BufferError and write nothing, so the
+        caller decides what to drop instead of the buffer growing unbounded.
         """
-        if not (maxlen != 0 and maxlen & (maxlen - 1) == 0):
+        if not _is_power_of_2(maxlen):
             raise ValueError('maxlen must be a power of 2')
+        if max_capacity is not None and not (_is_power_of_2(max_capacity) and max_capacity >= maxlen):
+            raise ValueError('max_capacity must be a power of 2 and at least maxlen')
 
         self.maxlen = maxlen
         self.mask = maxlen - 1
@@ -17,6 +23,10 @@ class CircularBuffer:
         self.write_idx = 0
         self.load = 0
         self.MAX_LOAD = 0.8 * self.maxlen  # Fill up to 80% before expanding
+        self.max_capacity = max_capacity
+
+        self.high_water_mark = 0   # Largest load seen since creation
+        self.n_expansions = 0
 
     def write_one(self, byte):
         self.buf[self.write_idx] = byte
@@ -24,10 +34,20 @@ class CircularBuffer:
         self.load += 1
 
     def write(self, bytes_):
-        if self._will_be_full(len(bytes_)):
-            self._expand()
-        for byte in bytes_:
-            self.write_one(byte)
+        """Writes all of bytes_ with at most two slice assignments, one up to
+        the end of the buffer and one for the part that wraps around.
+        """
+        size = len(bytes_)
+        if self._will_be_full(size):
+            self._expand(size)
+        first = min(size, self.maxlen - self.write_idx)
+        self.buf[self.write_idx:self.write_idx + first] = bytes_[:first]
+        if first < size:
+            self.buf[:size - first] = bytes_[first:]
+        self.write_idx = (self.write_idx + size) & self.mask
+        self.load += size
+        if self.load > self.high_water_mark:
+            self.high_water_mark = self.load
 
     def read(self):
         byte = self.buf[self.read_idx]
@@ -36,46 +56,96 @@ class CircularBuffer:
         return byte
 
     def read_until(self, stop_byte, ignore_first_byte):
-        """Returns all bytes up to and including stop_byte. If stop byte not
-        found at end of buffer, blocks until it is found.
+        """Returns all bytes up to and including stop_byte as a single bytes copy.
         If ignore_first_byte is True, the function does not return if the very first byte
-        read is the stop byte.
+        read is the stop byte (nor any stop bytes directly after it).
+        If stop_byte is not in the buffer, returns None and leaves the buffer
+        untouched.
+        """
+        start = 0
+        if ignore_first_byte:
+            while start < self.load and self.buf[(self.read_idx + start) & self.mask] == stop_byte:
+                start += 1
+
+        end = self._find(stop_byte, start)
+        if end == -1:
+            return None
+        return self._take(end + 1)
+
+    def _find(self, byte, start):
+        """Returns offset from read_idx of the first byte at or after offset
+        start, or -1. Searches both sides of the wrap point with bytearray.find.
+        """
+        head_len = min(self.load, self.maxlen - self.read_idx)
+        if start < head_len:
+            idx = self.buf.find(byte, self.read_idx + start, self.read_idx + head_len)
+            if idx != -1:
+                return idx - self.read_idx
+        idx = self.buf.find(byte, max(start - head_len, 0), self.load - head_len)
+        return -1 if idx == -1 else idx + head_len
+
+    def _take(self, size):
+        """Removes size bytes from the front of the buffer and returns them,
+        copying each byte exactly once.
         """
-        bytearr = []
-        byte = None
-        is_first_byte = True
-        while (byte != stop_byte or is_first_byte):
-            byte = self.read()
-            bytearr.append(byte)
-            if byte == stop_byte:
-                if ignore_first_byte and is_first_byte:
-                    continue
-                else:
-                    break
-            is_first_byte = False
-
-        return bytearray(bytearr)
+        head_len = min(size, self.maxlen - self.read_idx)
+        with memoryview(self.buf) as view:
+            if head_len == size:
+                data = bytes(view[self.read_idx:self.read_idx + size])
+            else:
+                data = b''.join((view[self.read_idx:], view[:size - head_len]))
+        self.read_idx = (self.read_idx + size) & self.mask
+        self.load -= size
+        return data
 
     def clear(self):
+        """Empties the buffer. Keeps its current size and statistics."""
         self.read_idx = 0
         self.write_idx = 0
         self.load = 0
         self.buf = bytearray(self.maxlen)
 
+    def stats(self):
+        return {
+            'size': self.maxlen,
+            'load': self.load,
+            'high_water_mark': self.high_water_mark,
+            'expansions': self.n_expansions,
+        }
+
     def _will_be_full(self, size):
         """Returns true if buf will be full after size bytes added to buffer"""
         return self.load + size >= self.MAX_LOAD
 
-    def _expand(self):
-        """Double buffer size."""
-        print('Expanding circular buffer from {} to {} bytes'.format(self.maxlen, 2*self.maxlen))
-        self.maxlen = 2 * self.maxlen
-        self.mask = self.maxlen - 1
-        self.MAX_LOAD = 0.8 * self.maxlen
-        self.locks = [asyncio.Lock() for _ in range(self.maxlen)]
-
-        new_buf = bytearray(self.maxlen)
-        with (yield from asyncio.Lock()):  # Don't allow reads/writes while expanding
-            for i in range(len(self.buf)):
-                new_buf[i] = self.buf[i]  # Copy data
-            self.buf = new_buf
+    def _expand(self, size):
+        """Grows the buffer by powers of 2 until size more bytes fit under
+        MAX_LOAD, or up to max_capacity. Data is unwrapped to the start of the
+        new buffer, so each byte is copied once.
+        Raises BufferError if size bytes do not fit even at max_capacity.
+        """
+        new_maxlen = self.maxlen
+        while self.load + size >= 0.8 * new_maxlen:
+            if self.max_capacity is not None and new_maxlen >= self.max_capacity:
+                break
+            new_maxlen *= 2
+
+        if self.load + size > new_maxlen:   # At cap, may fill up to 100%
+            raise BufferError('Circular buffer full: {} bytes do not fit in {} of {} bytes free'
+                .format(size, new_maxlen - self.load, new_maxlen))
+        if new_maxlen == self.maxlen:
+            return
+
+        print('Expanding circular buffer from {} to {} bytes'.format(self.maxlen, new_maxlen))
+        new_buf = bytearray(new_maxlen)
+        head_len = min(self.load, self.maxlen - self.read_idx)
+        with memoryview(self.buf) as view:
+            new_buf[:head_len] = view[self.read_idx:self.read_idx + head_len]
+            new_buf[head_len:self.load] = view[:self.load - head_len]
+
+        self.buf = new_buf
+        self.maxlen = new_maxlen
+        self.mask = new_maxlen - 1
+        self.MAX_LOAD = 0.8 * new_maxlen
+        self.read_idx = 0
+        self.write_idx = self.load
+        self.n_expansions += 1
@@ -0,0 +1,220 @@
+"""
+Real-time dance move classification from feature vectors (see features.py).
+
+Models are NumPy-only and stored as .npz files holding a 'kind' string, the
+'classes' array and the arrays needed by that kind of model. Optional 'mean'
+and 'scale' arrays standardize features before prediction. New kinds are added
+by decorating a Model subclass with @register_model.
+"""
+
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+
+MODELS = {}
+
+Prediction = namedtuple('Prediction', 'action confidence latency n_samples')
+
+
+def register_model(kind):
+    def register(cls):
+        cls.KIND = kind
+        MODELS[kind] = cls
+        return cls
+    return register
+
+
+def load_model(path):
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {key: data[key] for key in data.files}
+    kind = str(arrays.pop('kind'))
+    if kind not in MODELS:
+        raise ValueError('Unknown model kind {}. Known kinds: {}'.format(kind, sorted(MODELS)))
+    return MODELS[kind](**arrays)
+
+
+def save_model(path, model):
+    np.savez(path, kind=model.KIND, **model.arrays())
+
+
+class Model:
+    KIND = None
+    ARRAYS = ()   # Names of the arrays a model of this kind is built from
+
+    def __init__(self, classes, mean=None, scale=None, **arrays):
+        self.classes = np.asarray(classes).astype(str)
+        self.mean = mean
+        self.scale = scale
+        for name in self.ARRAYS:
+            setattr(self, name, np.asarray(arrays[name]))
+
+    def arrays(self):
+        arrays = {name: getattr(self, name) for name in self.ARRAYS}
+        arrays['classes'] = self.classes
+        if self.mean is not None:
+            arrays['mean'] = self.mean
+            arrays['scale'] = self.scale
+        return arrays
+
+    def predict_proba(self, X):
+        """Returns class probabilities of shape (n_windows, n_classes) for
+        features X of shape (n_windows, n_features).
+        """
+        X = np.asarray(X, dtype=float)
+        if self.mean is not None:
+            X = (X - self.mean) / self.scale
+        return self._predict_proba(X)
+
+    def _predict_proba(self, X):
+        raise NotImplementedError
+
+
+@register_model('linear')
+class LinearModel(Model):
+    """Multinomial logistic regression: softmax(X @ coef.T + intercept)."""
+    ARRAYS = ('coef', 'intercept')
+
+    def _predict_proba(self, X):
+        scores = X @ self.coef.T + self.intercept
+        scores -= scores.max(axis=1, keepdims=True)
+        exp = np.exp(scores)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+
+@register_model('knn')
+class KNNModel(Model):
+    """k nearest neighbours. Probability of a class is its share of the k votes."""
+    ARRAYS = ('X_train', 'y_train', 'k')
+
+    def _predict_proba(self, X):
+        k = int(self.k)
+        # Squared distances without materializing (n_windows, n_train, n_features)
+        dists = ((X * X).sum(axis=1)[:, None] - 2 * X @ self.X_train.T
+                 + (self.X_train * self.X_train).sum(axis=1)[None, :])
+        nearest = np.argpartition(dists, k - 1, axis=1)[:, :k]
+        votes = self.y_train[nearest]   # Class indices, (n_windows, k)
+        proba = np.zeros((len(X), len(self.classes)))
+        for c in range(len(self.classes)):
+            proba[:, c] = (votes == c).sum(axis=1)
+        return proba / k
+
+
+@register_model('tree')
+class TreeModel(Model):
+    """Binary decision tree in flat arrays, as in sklearn's tree_ attribute.
+    Node i splits on feature[i] <= threshold[i] into left[i]/right[i]. Leaves
+    have left[i] == -1 and value[i] holds their class counts.
+    """
+    ARRAYS = ('feature', 'threshold', 'left', 'right', 'value')
+
+    def _predict_proba(self, X):
+        nodes = np.zeros(len(X), dtype=int)
+        rows = np.arange(len(X))
+        while True:   # Descend all windows one level per iteration
+            internal = self.left[nodes] != -1
+            if not internal.any():
+                break
+            n = nodes[internal]
+            go_left = X[rows[internal], self.feature[n]] <= self.threshold[n]
+            nodes[internal] = np.where(go_left, self.left[n], self.right[n])
+        counts = self.value[nodes].astype(float)
+        return counts / counts.sum(axis=1, keepdims=True)
+
+
+class ClassifierEngine:
+    def __init__(self, model, on_prediction=None, min_confidence=0.6, n_agree=3,
+                 cooldown=2.0, ignore=('neutral',), loop=None):
+        """Runs model on feature vectors and reports debounced predictions.
+
+        submit() matches FeatureExtractor's on_features callback. With a loop,
+        windows are queued and classified in one batched model call per loop
+        iteration, so a backlog is cleared in a single call. Without a loop each
+        window is classified immediately.
+
+        A move is reported through on_prediction(Prediction) once it has been the
+        most likely class, with probability at least min_confidence, for n_agree
+        consecutive windows, and at least cooldown seconds have passed since the
+        last report. Classes in ignore are never reported.
+        Prediction.latency is the time in seconds from submit() of the window
+        that triggered the report until the report.
+        """
+        self.model = model
+        self.on_prediction = on_prediction
+        self.min_confidence = min_confidence
+        self.n_agree = n_agree
+        self.cooldown = cooldown
+        self.ignore = set(ignore)
+        self.loop = loop
+
+        self._pending = []           # (features, n_samples, submit time)
+        self._streak_class = None
+        self._streak = 0
+        self._last_report = -float('inf')
+
+        self.n_windows = 0
+        self.n_batches = 0
+        self.latencies = deque(maxlen=1000)        # Of reported predictions
+        self.inference_times = deque(maxlen=1000)  # Per batched model call
+
+    def submit(self, features, n_samples):
+        self._pending.append((features, n_samples, time.perf_counter()))
+        if self.loop is None:
+            self.run_pending()
+        elif len(self._pending) == 1:
+            self.loop.call_soon(self.run_pending)
+
+    def run_pending(self):
+        """Classifies all queued windows in one model call. Returns the list of
+        predictions reported.
+        """
+        if not self._pending:
+            return []
+        pending, self._pending = self._pending, []
+
+        start = time.perf_counter()
+        proba = self.model.predict_proba(np.stack([features for features, _, _ in pending]))
+        self.inference_times.append(time.perf_counter() - start)
+        self.n_batches += 1
+        self.n_windows += len(pending)
+
+        reported = []
+        best = proba.argmax(axis=1)
+        for (_, n_samples, submitted), c, p in zip(pending, best, proba[np.arange(len(best)), best]):
+            prediction = self._debounce(self.model.classes[c], p, n_samples, submitted)
+            if prediction is not None:
+                reported.append(prediction)
+                if self.on_prediction is not None:
+                    self.on_prediction(prediction)
+        return reported
+
+    def stats(self):
+        def summary(values):
+            if not values:
+                return None
+            return {'mean': float(np.mean(values)), 'max': float(np.max(values))}
+        return {
+            'windows': self.n_windows,
+            'batches': self.n_batches,
+            'latency': summary(self.latencies),
+            'inference_time': summary(self.inference_times),
+        }
+
+    def _debounce(self, action, confidence, n_samples, submitted):
+        if confidence < self.min_confidence or action in self.ignore:
+            self._streak_class, self._streak = None, 0
+            return None
+        if action == self._streak_class:
+            self._streak += 1
+        else:
+            self._streak_class, self._streak = action, 1
+
+        now = time.perf_counter()
+        if self._streak < self.n_agree or now - self._last_report < self.cooldown:
+            return None
+        self._last_report = now
+        self._streak_class, self._streak = None, 0
+        latency = now - submitted
+        self.latencies.append(latency)
+        return Prediction(action, float(confidence), latency, n_samples)
@@ -1,56 +1,205 @@
 """
 1. Create a python virtual environment if you haven't already with `python3 -m venv client`.
 2. `cd` into the folder and `pip3 install pycrypto`.
-3. `python3 client.py <ip_address> <port> <aes_key>` will start a client that connects to the
+3. `python3 client.py <ip_address> <port> <aes_key> [--framed]` will start a client that connects to the
    server at the port/address specified. Press Enter after starting the client to send
    a test message, encrypted with aes_key, to the server and exit.
+   With `--framed`, messages are length-prefixed. Start the server with `--framed` as well.
 
 If you are running the server on your laptop, ensure you use the IP address on the network the pi
 is connected to.
+
+AsyncClient sends from an asyncio task instead, reconnecting if the server is unreachable, so
+callers on the event loop never block on the network. comm.py uses it with `--server`.
 """
 
+import asyncio
 import base64
+import os
 import socket
+import struct
 import sys
+import time
+from collections import deque
 from time import sleep
 
 from Crypto.Cipher import AES
-from Crypto import Random
+
+
+# With framing, each message is preceded by its length. Must match server/message_framing.py
+LENGTH_PREFIX = struct.Struct('>H')
+
+
+class MessageEncoder:
+    def __init__(self, key):
+        """Encrypts messages for the eval server with AES-CBC under key
+        (bytes). Each message is PKCS#7-padded and gets a fresh random IV, and
+        iv + ciphertext is base64-encoded.
+        """
+        self.key = key
+
+    def encode(self, message):
+        """message is a str or ascii bytes. Returns base64 bytes."""
+        if isinstance(message, str):
+            message = message.encode('utf8')
+        # Make message length multiple of block size (PKCS#7)
+        pad = AES.block_size - len(message) % AES.block_size
+        iv = os.urandom(AES.block_size)
+        cipher = AES.new(self.key, AES.MODE_CBC, iv)
+        return base64.b64encode(iv + cipher.encrypt(message + bytes((pad,)) * pad))
 
 
 class Client:
-    def __init__(self, ip_addr, port_num, aes_key):
+    def __init__(self, ip_addr, port_num, aes_key, framed=False):
+        """If framed, messages are length-prefixed. The server must then be
+        started with --framed.
+        """
         self.key = bytes(str(aes_key), encoding = "utf8")
+        self.encoder = MessageEncoder(self.key)
+        self.framed = framed
         # Connect to TCP socket at ip_addr:port_num
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.sock.connect((ip_addr, port_num))
 
     def encrypt(self, message):
-        # Make message length multiple of block size
-        padded = self._pad(message)
-        iv = Random.new().read(16)
-        cipher = AES.new(self.key, AES.MODE_CBC, iv)
-        return base64.b64encode(iv + cipher.encrypt(padded))
+        return self.encoder.encode(message)
 
-    def _pad(self, s):
-        return s + (AES.block_size - len(s) % AES.block_size) * chr(AES.block_size - len(s) % AES.block_size)
+    def _encode(self, action, power_details):
+        """Returns the bytes to send for one message, framed if enabled."""
+        data = self.encrypt(self._format_message(action, power_details))
+        if self.framed:
+            data = LENGTH_PREFIX.pack(len(data)) + data
+        return data
 
-    def send(self, action, power_details=None):
+    def _format_message(self, action, power_details):
         # Fill dummy values if power_details not provided
         p = power_details if power_details else {'voltage': 0, 'current': 0, 'power': 0, 'cumpower': 0}
         # Format message per server expectations
-        message = '#{}|{}|{}|{}|{}'.format(action, p['voltage'], p['current'], p['power'], p['cumpower'])
-        self.sock.send(self.encrypt(message))
+        return '#{}|{}|{}|{}|{}'.format(action, p['voltage'], p['current'], p['power'], p['cumpower'])
+
+    def send(self, action, power_details=None):
+        self.sock.sendall(self._encode(action, power_details))
 
     def end(self):
         self.send('logout')
         self.sock.close()
 
 
+class AsyncClient(Client):
+    def __init__(self, ip_addr, port_num, aes_key, framed=False, max_queue=32, min_backoff=0.5,
+                 max_backoff=8.0, stable_after=5.0):
+        """Client that keeps a connection to the server open from an asyncio task.
+        Call start() from the event loop to connect.
+        send() encrypts the message and puts it on a queue of at most max_queue
+        messages, dropping the oldest message if full, so it never blocks.
+        If the server cannot be reached or the connection drops, the task
+        reconnects, waiting min_backoff seconds and doubling the wait up to
+        max_backoff after each failed attempt. A connection closed within
+        stable_after seconds counts as a failed attempt, so a server that
+        accepts and closes at once is not reconnected to in a tight loop. The
+        message being sent when the connection dropped is sent again after
+        reconnecting.
+        """
+        self.key = bytes(str(aes_key), encoding = "utf8")
+        self.encoder = MessageEncoder(self.key)
+        self.framed = framed
+        self.addr = (ip_addr, port_num)
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+        self.queue = asyncio.Queue(maxsize=max_queue)   # (message, time queued)
+        self._inflight = None
+        self._task = None
+
+        self.n_sent = 0
+        self.n_dropped = 0
+        self.n_connects = 0
+        self.latencies = deque(maxlen=1000)   # Seconds from send() until written to the socket
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+        return self._task
+
+    def send(self, action, power_details=None):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.queue.task_done()
+            self.n_dropped += 1
+        self.queue.put_nowait((self._encode(action, power_details), time.perf_counter()))
+
+    async def end(self, timeout=2.0):
+        """Sends logout, waits up to timeout seconds for queued messages to be
+        sent, then closes the connection.
+        """
+        self.send('logout')
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print('Closing with {} messages unsent'.format(self.queue.qsize()))
+        if self._task is not None:
+            self._task.cancel()
+
+    def stats(self):
+        return {
+            'sent': self.n_sent,
+            'dropped': self.n_dropped,
+            'queued': self.queue.qsize(),
+            'connects': self.n_connects,
+            'mean_latency': sum(self.latencies) / len(self.latencies) if self.latencies else None,
+            'max_latency': max(self.latencies) if self.latencies else None,
+        }
+
+    async def _run(self):
+        backoff = self.min_backoff
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(*self.addr)
+            except OSError as e:
+                print('Could not connect to {}:{} ({}), retrying in {}s'.format(*self.addr, e, backoff))
+                await asyncio.sleep(backoff)
+                backoff = min(2 * backoff, self.max_backoff)
+                continue
+
+            connected_at = time.monotonic()
+            self.n_connects += 1
+            # Server never sends data, so read() only returns when the connection closes
+            sender = asyncio.ensure_future(self._send_queued(writer))
+            closed = asyncio.ensure_future(reader.read())
+            try:
+                done, _ = await asyncio.wait([sender, closed], return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()   # Raise connection errors
+                print('Connection to {}:{} closed by server'.format(*self.addr))
+            except OSError as e:
+                print('Connection to {}:{} lost ({})'.format(*self.addr, e))
+            finally:
+                sender.cancel()
+                closed.cancel()
+                writer.close()
+
+            if time.monotonic() - connected_at >= self.stable_after:
+                backoff = self.min_backoff
+            print('Reconnecting to {}:{} in {}s'.format(*self.addr, backoff))
+            await asyncio.sleep(backoff)
+            backoff = min(2 * backoff, self.max_backoff)
+
+    async def _send_queued(self, writer):
+        while True:
+            if self._inflight is None:
+                self._inflight = await self.queue.get()
+            message, queued_at = self._inflight
+            writer.write(message)
+            await writer.drain()
+            self._inflight = None
+            self.queue.task_done()
+            self.n_sent += 1
+            self.latencies.append(time.perf_counter() - queued_at)
+
+
 if __name__ == '__main__':
-    if len(sys.argv) != 4:
+    if not (len(sys.argv) == 4 or (len(sys.argv) == 5 and sys.argv[4] == '--framed')):
         print('Invalid number of arguments')
-        print('python client.py [IP address] [Port] [AES key]')
+        print('python client.py [IP address] [Port] [AES key] [--framed]')
         sys.exit()
 
     ip_addr = sys.argv[1]
@@ -61,7 +210,7 @@ if __name__ == '__main__':
         print("AES key must be either 16, 24, or 32 bytes long")
         sys.exit()
 
-    client = Client(ip_addr, port_num, key)
+    client = Client(ip_addr, port_num, key, framed=len(sys.argv) == 5)
     action = None
     while action != 'logout':
         print('Enter dance move to send, or `logout` to close connection')
@@ -1,44 +1,97 @@
+import argparse
 import asyncio
-import sys
+from functools import partial
 
 import serial_asyncio
 from bitstring import BitArray
 
-from circ_buffer import CircularBuffer
-from framing import START_STOP_BYTE, Frame, IFrame, SFrame, HFrame
+from classifier import ClassifierEngine, load_model
+from client import AsyncClient
+from decoder import FrameDecoder
+from features import FeatureExtractor
+from framing import HFRAME_BYTES, SFRAME_BYTES, Frame, IFrame, SFrame, HFrame
+from payload import FIELD_FORMATS
+from recorder import BinaryRecorder
+from sink import CsvSink
 
 
-csvfile = None
+ARDUINO_BUFFER_SIZE = 16  # BUFFER_SIZE in arduino/main/main.ino, its send window
+RR_FRAMES = SFRAME_BYTES[SFrame.Type.RR]
+REJ_FRAMES = SFRAME_BYTES[SFrame.Type.REJ]
+SREJ_FRAMES = SFRAME_BYTES[SFrame.Type.SREJ]
 
 
 class SerialProtocol(asyncio.Protocol):
     """Based on https://stackoverflow.com/questions/30937042/asyncio-persisent-client-protocol-class-using-queue"""
-    def __init__(self):
+    def __init__(self, sinks=(), reorder_window=ARDUINO_BUFFER_SIZE - 1, ack_every=4, ack_delay=0.05,
+                 ack_window=ARDUINO_BUFFER_SIZE - 4, pool=None, loop=None):
+        """sinks receive the info bytes of every I-frame, in send seq order (see sink.CsvSink).
+
+        I-frames are received with selective repeat. A frame that arrives ahead
+        of a gap is held in a reorder buffer, and an SREJ is sent once for each
+        missing frame. Held frames are released to the sinks as soon as the
+        frames before them arrive. The Arduino overwrites a frame in its send
+        buffer BUFFER_SIZE frames later, so frames more than reorder_window
+        ahead of a gap mean it can no longer be filled: the missing frames are
+        then counted as lost and skipped.
+
+        Acks are cumulative: one RR acknowledges every frame delivered so far.
+        An RR is sent once ack_every delivered frames are unacknowledged (None
+        to disable), ack_delay seconds after the first unacknowledged frame, or
+        at once when the Arduino holds ack_window or more frames that have not
+        been acknowledged, including frames held behind a gap. Its send window
+        of BUFFER_SIZE frames therefore never fills up waiting for an ack.
+
+        Received frames are parsed into compact records (see Frame.parse). If
+        pool (a framing.FramePool) is given, records are reused from it. This
+        saves allocations but is not faster in CPython, so it is off by default.
+
+        Tasks and ack timers run on loop, by default the running loop, so the
+        protocol must be created from a coroutine or callback on it (as
+        serial_asyncio does) if loop is not given.
+        """
+        if ack_window >= ARDUINO_BUFFER_SIZE or (ack_every or 0) >= ARDUINO_BUFFER_SIZE:
+            raise ValueError('Acks must be sent before {} frames are unacknowledged'.format(ARDUINO_BUFFER_SIZE))
         self.transport = None
+        self.sinks = list(sinks)
+        self.reorder_window = reorder_window
+        self.ack_every = ack_every or ARDUINO_BUFFER_SIZE
+        self.ack_delay = ack_delay
+        self.ack_window = ack_window
+        self.loop = loop if loop is not None else asyncio.get_running_loop()
         self.queue = asyncio.Queue()
         self._ready = asyncio.Event()
-        asyncio.ensure_future(self._send_messages())
+        self.loop.create_task(self._send_messages())
 
         self._sending_iframe = False
         self._send_handshake_task = None          # Future
-        self._ack_iframe_ready = asyncio.Event()  # Trigger task ack iframe
         self._rej_iframe_ready = asyncio.Event()  # Trigger task rej iframe
         self._secondary_ready = asyncio.Event()   # Block message sending unless secondary ready
 
         self.send_seq = 1   # Secondary increments its own send_seq separately
-        self.recv_seq = 0   # Secondary increments its own recv_seq separately
-        self.start_stop_count = 0
+        self.recv_seq = 0   # Send seq of the last I-frame passed to the sinks
         self.rej_seqs = set()  # Send seqs of iframes that have been rejected
-        # self.file_pos_at_rej = None
-
-        self.buf = CircularBuffer(4096)
+        self.reorder_buf = {}  # Out-of-order I-frame info, keyed by send seq
+
+        self.n_iframes = 0     # I-frames received, including duplicates
+        self.n_reordered = 0   # Released from reorder_buf
+        self.n_duplicates = 0
+        self.n_lost = 0        # Skipped when a gap could no longer be filled
+        self.n_srej = 0
+        self.n_acks = 0
+        self._n_unacked = 0    # Frames delivered or skipped since the last RR
+        self._acked_seq = 0    # Send seq of the last frame acknowledged
+        self._ack_timer = None
+
+        self.pool = pool
+        self.decoder = FrameDecoder(4096, max_capacity=65536, compact=True, pool=pool)
         self.send_buf = {}  # Max size of 128, keyed by send seq
         self.send_buf[self.send_seq] = []  # Allow appending to first elem
 
     async def _send_handshake(self):
         """Send handshake every 2 seconds."""
         while True:
-            self.transport.write(HFrame(self.send_seq).bytes)
+            self.transport.write(HFRAME_BYTES[self.send_seq])
             print('Sent handshake')
             await asyncio.sleep(2)
 
@@ -88,94 +141,140 @@ class SerialProtocol(asyncio.Protocol):
         await self.send_message(message)
 
     def data_received(self, data):
-        global csvfile
-
-        self.buf.write(data)
-        self.start_stop_count += data.count(START_STOP_BYTE)
-
-        if self.start_stop_count > 1:   # Read if full frame received
-            bytearr = self.buf.read_until(START_STOP_BYTE, ignore_first_byte=True)
-            self.start_stop_count -= bytearr.count(START_STOP_BYTE)
-            # self.buf.clear()
-
-            # print('\nReceived bytes: {}'.format(BitArray(bytearr)))
-
+        self.decoder.feed(data)
+        for fr in self.decoder:   # Drain every complete frame received so far
             try:
-                fr = Frame.make_frame(bytearr)
-            except ValueError as e:  # Frame error, eg incorrect checksum
-                print(e)
-                # print('Bytearr: {}'.format(BitArray(bytearr)))
-                # print('Requesting retransmission')
-                # self.file_pos_at_rej = csvfile.tell()  # Go back to this position before writing
-                # self.rej_seqs.add(self.recv_seq)
-                # self._rej_iframe_ready.set()  # Send REJ frame
-                return
-
-            if fr.SORT == Frame.Sort.H:
-                if fr.recv_seq == self.send_seq:   # Arduino echoed seq sent
-                    # print('Received handshake ack, can now send data to the Arduino')
-                    self._send_handshake_task.cancel()  # Stop sending handshake
-                    self._ready.set()  # Enable sending messages
-                    self._secondary_ready.set()
-                    asyncio.ensure_future(self._ack_iframe())  # Enable acks
-                    asyncio.ensure_future(self._rej_iframe())  # Enable nacks
-                else:
-                    print('Handshake recv seq does not match handshake send seq')
-
-            elif fr.SORT == Frame.Sort.I:
-                # print('Fr send seq: {}'.format(fr.send_seq))
-                self.recv_seq = self._incr_seq(self.recv_seq)
-
-                # Retransmission received
-                if fr.send_seq in self.rej_seqs:
-                    # self.rej_seqs.remove(fr.send_seq)
-                    # self.file_pos_at_rej = None
-                    # csvfile.seek(self.file_pos_at_rej)
-                    # csvfile.write(fr.to_ascii() + '\n')
-                    # print('Overwrote csvfile')
-                    # self._ack_iframe_ready.set()
-                    pass
-
-                # In-order transmission
-                elif fr.send_seq == self.recv_seq:
-                    csvfile.write(fr.to_ascii() + '\n')
-                    # Acknowledge receipt of I-frame
-                    # print('Acknowledging I-frame')
-                    self._ack_iframe_ready.set()
-
-                # One or more frames were lost
+                self._handle_frame(fr)
+            finally:
+                if self.pool is not None:
+                    self.pool.put(fr)   # Only fields copied out of fr are kept
+
+    def _handle_frame(self, fr):
+        """fr is a ReceivedFrame (see Frame.parse)."""
+        if fr.sort == Frame.Sort.H:
+            if fr.recv_seq == self.send_seq:   # Arduino echoed seq sent
+                # print('Received handshake ack, can now send data to the Arduino')
+                self._send_handshake_task.cancel()  # Stop sending handshake
+                self._ready.set()  # Enable sending messages
+                self._secondary_ready.set()
+                asyncio.ensure_future(self._rej_iframe())  # Enable nacks
+            else:
+                print('Handshake recv seq does not match handshake send seq')
+
+        elif fr.sort == Frame.Sort.I:
+            self._receive_iframe(fr.send_seq, fr.info)
+
+        else:  # S-frame
+            # Branch not called since Arduino doesn't send S-frames
+            print('Received S-frame')
+            if fr.type == SFrame.Type.RR:
+                self._secondary_ready.set()  # Let messages be sent
+                # All frames up to recv_seq acked, del
+                self._clear_send_buf(fr.recv_seq)
+            elif fr.type == SFrame.Type.REJ:
+                # Resend frames from fr.recv_seq upto send_seq
+                # (send_seq incremented after last I send, do not include current send no.)
+                for i in range(fr.recv_seq, self.send_seq):
+                    self.send_message(self.send_buf[i])  # Dont incr send seq again
+            elif fr.type == SFrame.Type.RNR:
+                self._secondary_ready.wait()  # Block sending new messages
+                self._clear_send_buf(fr.recv_seq)
+
+    def _receive_iframe(self, seq, info):
+        self.n_iframes += 1
+        expected = self._incr_seq(self.recv_seq)
+        ahead = (seq - expected) & 0x7F
+        if ahead >= 128 - self.reorder_window or seq in self.reorder_buf:
+            self.n_duplicates += 1  # Already received, eg retransmitted twice
+            return
+
+        if ahead >= self.reorder_window:  # Oldest gaps can no longer be filled
+            skipped = []
+            for _ in range(ahead - self.reorder_window + 1):
+                expected = self._incr_seq(self.recv_seq)
+                if expected in self.reorder_buf:
+                    self._deliver(expected, self.reorder_buf.pop(expected))
+                    self.n_reordered += 1
                 else:
-                    print('Frame(s) {} missing. Requesting retransmission'.format(
-                        [i for i in range(self.recv_seq, fr.send_seq)])
-                    )
-                    # self.recv_seq = self._decr_seq(self.recv_seq)
-                    # self._rej_iframe_ready.set()  # Send REJ frame
-                    # self.rej_seqs.add(fr.send_seq)
-                    pass
-
-                if fr.send_seq & 0x1F == 0:  # Every 32 frames, force write to file
-                    csvfile.flush()
-
-            else:  # S-frame
-                # Branch not called since Arduino doesn't send S-frames
-                print('Received S-frame')
-                if fr.TYPE == SFrame.Type.RR:
-                    self._secondary_ready.set()  # Let messages be sent
-                    # All frames up to recv_seq acked, del
-                    self._clear_send_buf(fr.recv_seq)
-                elif fr.TYPE == SFrame.Type.REJ:
-                    # Resend frames from fr.recv_seq upto send_seq
-                    # (send_seq incremented after last I send, do not include current send no.)
-                    for i in range(fr.recv_seq, self.send_seq):
-                        self.send_message(self.send_buf[i])  # Dont incr send seq again
-                elif fr.TYPE == SFrame.Type.RNR:
-                    self._secondary_ready.wait()  # Block sending new messages
-                    self._clear_send_buf(fr.recv_seq)
+                    skipped.append(expected)
+                    self.rej_seqs.discard(expected)
+                    self.recv_seq = expected
+                    self._n_unacked += 1   # So the next RR moves past it
+            if skipped:
+                self.n_lost += len(skipped)
+                print('Frame(s) {} lost'.format(skipped))
+            ahead = self.reorder_window - 1
+
+        if ahead == 0:
+            self._deliver(seq, info)
+        else:
+            self.reorder_buf[seq] = info
+            for i in range(ahead):  # Request each missing frame once
+                missing = (self.recv_seq + 1 + i) & 0x7F
+                if missing not in self.reorder_buf and missing not in self.rej_seqs:
+                    self.rej_seqs.add(missing)
+                    self.n_srej += 1
+                    self.queue.put_nowait(SREJ_FRAMES[missing])
+
+        # Release frames held behind a gap that is now filled
+        while self._incr_seq(self.recv_seq) in self.reorder_buf:
+            next_seq = self._incr_seq(self.recv_seq)
+            self._deliver(next_seq, self.reorder_buf.pop(next_seq))
+            self.n_reordered += 1
+
+        if self._n_unacked:
+            # Frames the Arduino must keep, up to the last one delivered or held
+            n_outstanding = max([(self.recv_seq - self._acked_seq) & 0x7F]
+                                + [(held - self._acked_seq) & 0x7F for held in self.reorder_buf])
+            if self._n_unacked >= self.ack_every or n_outstanding >= self.ack_window:
+                self._ack()
+            elif self._ack_timer is None:
+                self._ack_timer = self.loop.call_later(self.ack_delay, self._ack)
+
+    def _deliver(self, seq, info):
+        self.recv_seq = seq
+        self.rej_seqs.discard(seq)
+        for sink in self.sinks:
+            sink.write(info)
+        self._n_unacked += 1
+
+    def _ack(self):
+        """Queues an RR with N(R) set to (self.recv_seq + 1) mod 128.
+        N(R) acknowledges that all frames with N(S) values up to N(R)−1 mod 128
+        have been received and indicates the N(S) of the next frame it expects
+        to receive.
+        """
+        if self._ack_timer is not None:
+            self._ack_timer.cancel()
+            self._ack_timer = None
+        if self._n_unacked:
+            self.queue.put_nowait(RR_FRAMES[self._incr_seq(self.recv_seq)])
+            self.n_acks += 1
+            self._n_unacked = 0
+            self._acked_seq = self.recv_seq
+
+    def stats(self):
+        return {
+            'iframes': self.n_iframes,
+            'reordered': self.n_reordered,
+            'duplicates': self.n_duplicates,
+            'lost': self.n_lost,
+            'srej_sent': self.n_srej,
+            'held': len(self.reorder_buf),
+            'acks_sent': self.n_acks,
+            'acks_per_iframe': self.n_acks / self.n_iframes if self.n_iframes else 0.0,
+        }
 
     def connection_lost(self, exc):
         print('Port closed')
+        self.close_sinks()
         self.transport.loop.stop()
 
+    def close_sinks(self):
+        """Flushes and closes all sinks. Safe to call more than once."""
+        for sink in self.sinks:
+            sink.close()
+
     def _clear_send_buf(self, start):
         for i in range(start):
             del self.send_buf[i]
@@ -184,21 +283,6 @@ class SerialProtocol(asyncio.Protocol):
                                         if self.send_seq in self.send_buf
                                         else [])
 
-    async def _ack_iframe(self):
-        """Send an S-frame with N(R) field set to (self.recv_seq + 1) mod 128.
-        N(R) acknowledges that all frames with N(S) values up to N(R)−1 mod 128
-        have been received and indicates the N(S) of the next frame it expects
-        to receive.
-        Since data_received is synchronous, it cannot call an async function to
-        send messages. Therefore it insteads sets self._ack_iframe_ready to
-        trigger this function.
-        """
-        while True:
-            await self._ack_iframe_ready.wait()
-            sfr = SFrame((self.recv_seq + 1) & 0x7F, SFrame.Type.RR)
-            await self.send_message(sfr.bytes)
-            self._ack_iframe_ready.clear()
-
     async def _rej_iframe(self):
         """Send an S-frame with N(R) field set to self.recv_seq mod 128.
         Requests immediate retransmission of all frames from N(R) onwards,
@@ -210,8 +294,7 @@ class SerialProtocol(asyncio.Protocol):
         while True:
             await self._rej_iframe_ready.wait()
             print('Sending rej with seq {}'.format(self.recv_seq))
-            sfr = SFrame(self.recv_seq, SFrame.Type.REJ)
-            await self.send_message(sfr.bytes)
+            await self.send_message(REJ_FRAMES[self.recv_seq])
             self._rej_iframe_ready.clear()
 
     def _incr_seq(self, seq):
@@ -221,6 +304,22 @@ class SerialProtocol(asyncio.Protocol):
         return (seq - 1) & 0x7F  # 0-127
 
 
+def power_details(fields):
+    """Returns power fields of an I-frame payload, as split on commas or
+    decoded from a binary payload (see FeatureExtractor.last_fields), in the
+    form expected by client.Client.send. Returns None if there are no power
+    fields, so the client sends dummy values.
+    """
+    if fields is None or len(fields) < 22:
+        return None
+    try:
+        voltage, current, power, energy = (field.decode('ascii') if isinstance(field, bytes) else fmt.format(field)
+                                           for field, fmt in zip(fields[18:22], FIELD_FORMATS[18:22]))
+    except UnicodeDecodeError:
+        return None
+    return {'voltage': voltage, 'current': current, 'power': power, 'cumpower': energy}
+
+
 async def feed_frame(protocol, frame):
     if frame.SORT == Frame.Sort.I:
         await protocol.send_iframe(frame.bytes)
@@ -229,18 +328,44 @@ async def feed_frame(protocol, frame):
 
 
 if __name__ == '__main__':
-    if (len(sys.argv) != 3):
-        print('python comm.py <folder_name> <file_name>')
-        sys.exit()
-
-    csvfile = open('{}/{}.csv'.format(sys.argv[1], sys.argv[2]), 'w+', newline='')
-    csvfile.seek(0)
-    csvfile.truncate()   # remove preivous data
-    csvfile.write('AcX 1,AcY 1,AcZ 1,GyX 1,GyY 1,GyZ 1,AcX 2,AcY 2,AcZ 2,GyX 2,GyY 2,GyZ 2,AcX 3,AcY 3,AcZ 3,GyX 3,GyY 3,GyZ 3,voltage,current,power,energy\n')
+    parser = argparse.ArgumentParser()
+    parser.add_argument('folder_name')
+    parser.add_argument('file_name', help='Sensor data is saved to <folder_name>/<file_name>.csv')
+    parser.add_argument('--bin', action='store_true',
+                        help='Also record a binary <file_name>.rec, see recorder.py')
+    parser.add_argument('--model', help='Classify dance moves with this model file, see classifier.py')
+    parser.add_argument('--server', nargs=3, metavar=('IP', 'PORT', 'AES_KEY'),
+                        help='Send moves predicted by --model to the eval server')
+    parser.add_argument('--framed', action='store_true',
+                        help='Length-prefix messages to the server (server must use --framed too)')
+    parser.add_argument('--ack-every', type=int, default=4, metavar='K',
+                        help='Acknowledge every K I-frames (default: 4, 0 to ack only on timeout or full window)')
+    parser.add_argument('--ack-delay', type=float, default=50, metavar='MS',
+                        help='Acknowledge at most MS ms after an I-frame is received (default: 50)')
+    args = parser.parse_args()
 
     loop = asyncio.get_event_loop()
+    path = '{}/{}'.format(args.folder_name, args.file_name)
+    sinks = [CsvSink(path + '.csv', loop=loop)]  # Overwrites previous data
+    if args.bin:
+        sinks.append(BinaryRecorder(path + '.rec', loop=loop))
+    client = None
+    if args.server:
+        client = AsyncClient(args.server[0], int(args.server[1]), args.server[2], framed=args.framed)
+        client.start()
+    if args.model:
+        def on_prediction(p):
+            print('Predicted {} ({:.2f}), latency {:.1f} ms'.format(p.action, p.confidence, p.latency * 1000))
+            if client is not None:
+                client.send(p.action, power_details(extractor.last_fields))
+
+        engine = ClassifierEngine(load_model(args.model), on_prediction=on_prediction, loop=loop)
+        extractor = FeatureExtractor(on_features=engine.submit)
+        sinks.append(extractor)
+
     coro = serial_asyncio.create_serial_connection(loop,
-                                                   SerialProtocol,
+                                                   partial(SerialProtocol, sinks=sinks, ack_every=args.ack_every,
+                                                           ack_delay=args.ack_delay / 1000),
                                                    '/dev/serial0',
                                                    baudrate=115200)
     _, proto = loop.run_until_complete(coro)
@@ -252,6 +377,9 @@ if __name__ == '__main__':
     except KeyboardInterrupt:
         print('Closing connection')
 
+    proto.close_sinks()
+    print('Link stats: {}'.format(proto.stats()))
+    if client is not None:
+        loop.run_until_complete(client.end())
+        print('Client stats: {}'.format(client.stats()))
     loop.close()
-    csvfile.flush()
-    csvfile.close()
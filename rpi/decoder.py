@@ -0,0 +1,86 @@
+from circ_buffer import CircularBuffer
+from framing import START_STOP_BYTE, Frame
+
+
+_START = bytes([START_STOP_BYTE])
+
+
+class FrameDecoder:
+    def __init__(self, maxlen=4096, max_capacity=65536, compact=False, pool=None):
+        """Incremental decoder for a stream of escaped frames.
+        Feed it chunks of any size with feed(), then iterate over it to get every
+        complete frame received so far, in order.
+        Bytes between two START_STOP_BYTEs are treated as one candidate frame, so
+        a stop byte can also act as the start byte of the next frame. Garbage
+        before the first START_STOP_BYTE, empty frames and frames that fail to
+        parse (eg incorrect checksum) are dropped, and decoding resumes at the
+        next START_STOP_BYTE.
+        If compact, frames are parsed into ReceivedFrame records (see
+        Frame.parse) instead of Frame objects, taken from pool if given. The
+        caller should put each record back in the pool once it is handled.
+        """
+        self.compact = compact or pool is not None
+        self.pool = pool
+        self.buf = CircularBuffer(maxlen, max_capacity)
+        self.n_delimiters = 0    # START_STOP_BYTEs in self.buf
+        self._in_frame = False   # True if last START_STOP_BYTE read may start a frame
+
+        self.n_frames = 0        # Frames decoded successfully
+        self.n_errors = 0        # Candidate frames dropped because they could not be parsed
+        self.n_discarded = 0     # Bytes dropped while searching for a START_STOP_BYTE or on overflow
+        self.n_overflows = 0     # Times the buffer overflowed and was cleared
+
+    def feed(self, data):
+        """Adds data to the internal buffer.
+        This is not back-pressure: complete frames are drained after every
+        feed, so the buffer only fills up on a partial frame that never ends
+        (eg noise without START_STOP_BYTEs). Pausing the transport would not
+        help then, as only more data can end the frame. On overflow, the
+        buffered data and data are both dropped, counted in n_overflows and
+        n_discarded, and decoding resynchronizes on the next frame.
+        """
+        try:
+            self.buf.write(data)
+        except BufferError as e:
+            print('Decoder overflow, dropping buffered data: {}'.format(e))
+            self.n_overflows += 1
+            self.n_discarded += self.buf.load + len(data)
+            self.reset()
+            return
+        self.n_delimiters += data.count(START_STOP_BYTE)
+
+    def __iter__(self):
+        """Yields every complete frame in the buffer. Partial frames are kept
+        until the rest is fed.
+        """
+        while self.n_delimiters > 0:
+            bytes_ = self.buf.read_until(START_STOP_BYTE, ignore_first_byte=False)
+            self.n_delimiters -= 1
+
+            if not self._in_frame:   # Everything before the first START_STOP_BYTE is garbage
+                self.n_discarded += len(bytes_) - 1
+                self._in_frame = True
+                continue
+
+            if len(bytes_) == 1:     # Stop byte of a frame directly followed by start byte of next
+                continue
+
+            try:
+                if self.pool is not None:
+                    frame = Frame.parse(_START + bytes_, self.pool.get())
+                elif self.compact:
+                    frame = Frame.parse(_START + bytes_)
+                else:
+                    frame = Frame.make_frame(_START + bytes_)
+            except ValueError as e:  # Frame error, eg incorrect checksum
+                print(e)
+                self.n_errors += 1
+                continue
+
+            self.n_frames += 1
+            yield frame
+
+    def reset(self):
+        self.buf.clear()
+        self.n_delimiters = 0
+        self._in_frame = False
@@ -0,0 +1,152 @@
+"""
+Streaming feature extraction over the last N sensor samples.
+
+FeatureExtractor is a sink (see sink.py), so SerialProtocol can feed it the
+payload of every in-order I-frame. Every `hop` samples it computes one feature
+vector over the last `window` samples and passes it to on_features.
+"""
+
+import numpy as np
+
+from payload import decode, is_binary
+from session import SAMPLE_PERIOD
+from sink import SENSOR_COLUMNS
+
+
+N_IMU_AXES = 18   # AcX..GyZ for 3 IMUs, the first 18 payload fields
+BAND_EDGES = (0.5, 3, 6, 10)   # Hz. The last band runs from 10 Hz up to Nyquist
+STATS = ('mean', 'std', 'min', 'max', 'energy', 'jerk')
+
+
+def nyquist_bands(sample_period, edges=BAND_EDGES):
+    """Returns (lo, hi) bands between consecutive edges, the last ending at
+    the Nyquist frequency of sample_period.
+    """
+    edges = tuple(edges) + (0.5 / sample_period,)
+    return tuple(zip(edges[:-1], edges[1:]))
+
+
+BANDS = nyquist_bands(SAMPLE_PERIOD)   # Up to 27.5 Hz at the 55 Hz SAMPLE_RATE
+
+
+class FeatureExtractor:
+    def __init__(self, window=50, hop=10, on_features=None, n_axes=N_IMU_AXES,
+                 bands=None, sample_period=SAMPLE_PERIOD):
+        """Keeps the last window samples in a preallocated ring and calls
+        on_features(features, n_samples) every hop samples once the ring is
+        full. n_samples is the number of samples pushed so far.
+
+        Mean, std, energy (mean square) and jerk (RMS of the first difference
+        divided by sample_period) come from running sums updated per sample.
+        Min/max and FFT band powers need the whole window and are computed
+        with one vectorized call each per hop. bands defaults to
+        nyquist_bands(sample_period).
+        """
+        if hop < 1 or window < 2:
+            raise ValueError('window must be at least 2 and hop at least 1')
+        self.window = window
+        self.hop = hop
+        self.on_features = on_features
+        self.n_axes = n_axes
+        if bands is None:
+            bands = nyquist_bands(sample_period)
+        self.sample_period = sample_period
+        self.bands = bands
+
+        self.n_samples = 0
+        self.n_bad_rows = 0
+        self.last_fields = None     # All payload fields of the last row written, bytes if CSV, floats if binary
+        self._ring = np.zeros((window, n_axes))
+        self._pos = 0               # Index in ring of the oldest sample once full
+        self._last = np.zeros(n_axes)
+        self._sum = np.zeros(n_axes)
+        self._sumsq = np.zeros(n_axes)
+        self._jerk_sumsq = np.zeros(n_axes)
+
+        freqs = np.fft.rfftfreq(window, sample_period)
+        # Row b sums the power spectrum over frequencies in band b
+        self._band_matrix = np.array([(lo <= freqs) & (freqs < hi) for lo, hi in bands], dtype=float)
+
+    def feature_names(self):
+        axes = SENSOR_COLUMNS[:self.n_axes]
+        names = ['{} {}'.format(stat, axis) for stat in STATS for axis in axes]
+        names += ['band {}-{}Hz {}'.format(lo, hi, axis) for lo, hi in self.bands for axis in axes]
+        return names
+
+    def write(self, info):
+        """Sink interface. Parses the IMU fields of one payload, CSV or binary
+        (see payload.py), and pushes them.
+        """
+        self.last_fields = None
+        try:
+            if is_binary(info):
+                self.last_fields = decode(info)
+                sample = np.array(self.last_fields[:self.n_axes])
+            else:
+                self.last_fields = info.split(b',')
+                sample = np.array([float(field) for field in self.last_fields[:self.n_axes]])
+        except ValueError:
+            sample = None
+        if sample is None or len(sample) != self.n_axes:
+            self.n_bad_rows += 1
+            return
+        self.push(sample)
+
+    def close(self):
+        pass
+
+    def push(self, sample):
+        """Adds one sample (array of n_axes values). Returns the feature vector if
+        one was computed for this sample, else None.
+        """
+        if self.n_samples >= self.window:   # Evict oldest sample and its difference to the next
+            old = self._ring[self._pos]
+            diff = self._ring[(self._pos + 1) % self.window] - old
+            self._sum -= old
+            self._sumsq -= old * old
+            self._jerk_sumsq -= diff * diff
+        if self.n_samples:
+            diff = sample - self._last
+            self._jerk_sumsq += diff * diff
+
+        self._ring[self._pos] = sample
+        self._last = self._ring[self._pos]
+        self._sum += sample
+        self._sumsq += sample * sample
+        self._pos = (self._pos + 1) % self.window
+        self.n_samples += 1
+
+        if self.n_samples % (64 * self.window) == 0:   # Stop float error from accumulating
+            self._resum()
+
+        if self.n_samples < self.window or (self.n_samples - self.window) % self.hop:
+            return None
+        features = self._features()
+        if self.on_features is not None:
+            self.on_features(features, self.n_samples)
+        return features
+
+    def _ordered(self):
+        """Returns the window oldest sample first (a copy)."""
+        return np.concatenate((self._ring[self._pos:], self._ring[:self._pos]))
+
+    def _resum(self):
+        ordered = self._ordered()
+        self._sum = ordered.sum(axis=0)
+        self._sumsq = (ordered * ordered).sum(axis=0)
+        diff = np.diff(ordered, axis=0)
+        self._jerk_sumsq = (diff * diff).sum(axis=0)
+
+    def _features(self):
+        n = self.window
+        mean = self._sum / n
+        energy = self._sumsq / n
+        std = np.sqrt(np.maximum(energy - mean * mean, 0))
+        jerk = np.sqrt(np.maximum(self._jerk_sumsq, 0) / (n - 1)) / self.sample_period
+
+        spectrum = np.fft.rfft(self._ordered() - mean, axis=0)
+        power = (spectrum.real ** 2 + spectrum.imag ** 2) / n
+        band_powers = self._band_matrix @ power   # (n_bands, n_axes)
+
+        return np.concatenate((mean, std, self._ring.min(axis=0), self._ring.max(axis=0),
+                               energy, jerk, band_powers.ravel()))
@@ -1,12 +1,28 @@
+import binascii
 from enum import Enum
 
-import bitstring
 from bitstring import BitArray
-from crc16 import crc16xmodem
+
+try:
+    from crc16 import crc16xmodem
+    crc16xmodem(b'')  # The C module imports but fails when called on Python >= 3.10
+except (ImportError, SystemError):
+    def crc16xmodem(data, crc=0):
+        """CRC-16/XMODEM (polynomial 0x1021, initial value crc). binascii's
+        table-driven CRC-CCITT is the same CRC, so no extra module is needed.
+        Pass the result of one call as crc to continue over more data.
+        """
+        return binascii.crc_hqx(data, crc)
 
 
 START_STOP_BYTE = 126  # 7E
 ESCAPE_BYTE = 125      # 7D
+MIN_FRAME_LEN = 6      # Start, 2 control, 2 checksum, stop bytes
+
+_FLAG = bytes([START_STOP_BYTE])
+_ESC = bytes([ESCAPE_BYTE])
+_ESC_FLAG = bytes([ESCAPE_BYTE, 94])  # 7E ^ 20 = uint 94
+_ESC_ESC = bytes([ESCAPE_BYTE, 93])   # 7D ^ 20 = uint 93
 
 
 class Frame:
@@ -19,115 +35,181 @@ class Frame:
     CONTROL_MASK = BitArray('0x0003')
     SFRAME_MASK = BitArray('0x000C')
 
-    def __init__(self, bitarr, info):
-        """Stores escaped frame in self.bytes and unescaped frame in self.bitarr.
-        Other useful fields such as control and checksum are also stored as instance
-        members.
+    def __init__(self, bitarr, info, escaped=False):
+        """Stores escaped frame in self.bytes and unescaped frame in self.raw.
+        bitarr may be a BitArray or any bytes-like object holding one unescaped
+        frame, including start/stop bytes, or the escaped frame if escaped is
+        True. Other useful fields such as recv_seq and checksum are also stored
+        as instance members.
         """
-        self.bytes = Frame.escape(bitarr.bytes)   # type bytes. Contains full, escaped frame
-        self.bitarr = bitarr          # type bitarr. Contains unescaped frame, with start/stop bytes
+        if isinstance(bitarr, BitArray):
+            bitarr = bitarr.bytes
+        bytes_ = bytes(bitarr)
+        if escaped:   # Keep the frame as received rather than escaping it again
+            self._load(Frame.unescape(bytes_), bytes_, info)
+        else:
+            self._load(bytes_, Frame.escape(bytes_), info)
 
-        self.control = self.bitarr[8:24]   # type bitarr
-        self.recv_seq = self.control[0:7].uint
-        self.info = self.bitarr[24:-24].bytes if info else None   # type bitarr
-        self.checksum = self.bitarr[-24:-8].uint                  # type uint, does NOT recalculate
+    def _load(self, raw, bytes_, info):
+        self.raw = raw          # type bytes. Contains unescaped frame, with start/stop bytes
+        self.bytes = bytes_     # type bytes. Contains full, escaped frame
+        self._bitarr = None
+
+        self.recv_seq = self.raw[1] >> 1
+        self.info = self.raw[3:-3] if info else None   # type bytes
+        self.checksum = (self.raw[-3] << 8) | self.raw[-2]   # type uint, does NOT recalculate
         if not self.is_checksum_valid():
             raise ValueError('Checksum received ({}) is not equal to checksum calculated ({})'
-                .format(self.checksum, self.calc_checksum(self.bitarr[8:-24].bytes)))
+                .format(self.checksum, self.calc_checksum(self.raw[1:-3])))
+
+    @property
+    def bitarr(self):
+        """Unescaped frame as a BitArray. Built on first access only, since
+        nothing on the receive path needs it.
+        """
+        if self._bitarr is None:
+            self._bitarr = BitArray(bytes=self.raw)
+        return self._bitarr
+
+    @property
+    def control(self):
+        return self.bitarr[8:24]
 
     def calc_checksum(self, bytes_):
         return crc16xmodem(bytes_)
 
     def is_checksum_valid(self):
-        return self.checksum == self.calc_checksum(self.bitarr[8:-24].bytes)
+        return self.checksum == self.calc_checksum(self.raw[1:-3])
 
     @staticmethod
     def escape(bytes_):
-        """Escapes bytes 7D and 7E with 7D EXCEPT for first and last bytes"""
-        escaped = []
-        for index, byte in enumerate(bytes_):
-            if (byte == START_STOP_BYTE
-              and not (index == 0 or index == len(bytes_)-1)):
-                escaped.append(ESCAPE_BYTE)
-                escaped.append(94)  # 7E ^ 20 = uint 94
-            elif (byte == ESCAPE_BYTE
-              and not (index == 0 or index == len(bytes_)-1)):
-                escaped.append(ESCAPE_BYTE)
-                escaped.append(93)  # 7D ^ 20 = uint 93
-            else:
-                escaped.append(byte)
-
-        return bytes(escaped)
+        """Escapes bytes 7D and 7E with 7D EXCEPT for first and last bytes.
+        Works on whole slices with bytes.replace, so there is no per-byte Python
+        work. Frames without special bytes in the middle are returned as is.
+        """
+        bytes_ = bytes(bytes_)
+        middle = bytes_[1:-1]
+        if ESCAPE_BYTE not in middle and START_STOP_BYTE not in middle:
+            return bytes_
+
+        # 7D must be escaped first, otherwise escape bytes added for 7E get escaped
+        middle = middle.replace(_ESC, _ESC_ESC).replace(_FLAG, _ESC_FLAG)
+        return bytes_[:1] + middle + bytes_[-1:]
 
     @staticmethod
     def unescape(bytes_):
-        """De-escapes bytes 7D and 7E with 7D EXCEPT for first and last bytes"""
-        escape_state = 0
-        unescaped = []
-        for index, byte in enumerate(bytes_):
-            # Remove only first escape byte in a pair
-            if (byte == ESCAPE_BYTE and escape_state == 0
-              and not (index == 0 or index == len(bytes_)-1)):
-                escape_state = 1
-            # No need for index check since escape state is 1 for 2nd elem onwards
-            elif escape_state == 1:
-                if byte == 94:     # 7E was xor-ed
-                    unescaped.append(START_STOP_BYTE)
-                elif byte == 93:   # 7D was xor-ed
-                    unescaped.append(ESCAPE_BYTE)
-                else:
-                    raise ValueError('Byte {} escaped when it should not be'.format(byte))
-                escape_state = 0
-            else:
-                unescaped.append(byte)
-                escape_state = 0
-
-        return bytes(unescaped)
+        """De-escapes bytes 7D and 7E with 7D EXCEPT for first and last bytes.
+        An escape byte second from the end still escapes the last byte.
+        Raises ValueError if an escape byte is followed by anything other than
+        5D or 5E.
+        """
+        bytes_ = bytes(bytes_)
+        if len(bytes_) < 3:
+            return bytes_
+
+        # Last byte belongs to the middle if the byte before it starts an escape pair
+        if bytes_[-2] == ESCAPE_BYTE:
+            middle, last = bytes_[1:], b''
+        else:
+            middle, last = bytes_[1:-1], bytes_[-1:]
+        if ESCAPE_BYTE not in middle:
+            return bytes_
+
+        # Escaped bytes are never 7D, so every 7D in the middle starts a pair
+        n_escapes = middle.count(_ESC)
+        if n_escapes != middle.count(_ESC_FLAG) + middle.count(_ESC_ESC):
+            Frame._raise_bad_escape(middle)
+        middle = middle.replace(_ESC_FLAG, _FLAG).replace(_ESC_ESC, _ESC)
+        return bytes_[:1] + middle + last
+
+    @staticmethod
+    def _raise_bad_escape(middle):
+        """Raises ValueError naming the first byte that follows an escape byte
+        but is not 5D or 5E.
+        """
+        idx = middle.find(_ESC)
+        while idx != -1:
+            byte = middle[idx + 1] if idx + 1 < len(middle) else None
+            if byte not in (93, 94):
+                raise ValueError('Byte {} escaped when it should not be'.format(byte))
+            idx = middle.find(_ESC, idx + 2)
 
     @staticmethod
     def make_frame(bytes_):
-        """Creates I, S or H-frame based on bitarr. Bitarr must contain exactly
-        one complete frame, including start and stop bytes.
-        Frame returned is of type Frame, not its subclass.
+        """Creates I, S or H-frame based on bytes_. bytes_ must contain exactly
+        one complete, escaped frame, including start and stop bytes.
         """
         if (bytes_[0] != START_STOP_BYTE or bytes_[-1] != START_STOP_BYTE):
             raise ValueError('Message does not contain either start byte, stop byte, or both')
 
-        bitarr = BitArray(Frame.unescape(bytes_))
-        control = bitarr[8:24]
-        sort = Frame.get_frame_sort(control)
+        raw = Frame.unescape(bytes_)
+        if len(raw) < MIN_FRAME_LEN:
+            raise ValueError('Frame of {} bytes is too short'.format(len(raw)))
+
+        bytes_ = bytes(bytes_)
+        control_byte2 = raw[2]
+        sort = Frame.get_frame_sort(control_byte2)
         if sort == Frame.Sort.I:
-            frame = Frame(bitarr, info=True)
-            frame.__class__ = IFrame
-            frame.SORT = Frame.Sort.I
-            frame.send_seq = control[8:15].uint
+            frame = IFrame.__new__(IFrame)
+            frame._load(raw, bytes_, info=True)
+            frame.send_seq = control_byte2 >> 1
 
         elif sort == Frame.Sort.S:
-            frame = Frame(bitarr, info=False)
-            frame.__class__ = SFrame
-            frame.SORT = Frame.Sort.S
-            frame.TYPE = Frame.get_sframe_type(control)
+            frame = SFrame.__new__(SFrame)
+            frame._load(raw, bytes_, info=False)
+            frame.TYPE = Frame.get_sframe_type(control_byte2)
+
+        else:
+            frame = HFrame.__new__(HFrame)
+            frame._load(raw, bytes_, info=False)
+
+        return frame
 
-        elif sort == Frame.Sort.H:
-            frame = Frame(bitarr, info=False)
-            frame.__class__ = HFrame
-            frame.SORT = Frame.Sort.H
+    @staticmethod
+    def parse(bytes_, frame=None):
+        """Like make_frame, but returns a ReceivedFrame, which holds only what
+        the receive path reads and neither re-escapes the frame nor copies the
+        info. If frame is given (eg from a FramePool) it is filled in and
+        returned instead of a new ReceivedFrame.
+        """
+        if (bytes_[0] != START_STOP_BYTE or bytes_[-1] != START_STOP_BYTE):
+            raise ValueError('Message does not contain either start byte, stop byte, or both')
 
+        raw = Frame.unescape(bytes_)
+        if len(raw) < MIN_FRAME_LEN:
+            raise ValueError('Frame of {} bytes is too short'.format(len(raw)))
+        checksum = (raw[-3] << 8) | raw[-2]
+        if checksum != crc16xmodem(raw[1:-3]):
+            raise ValueError('Checksum received ({}) is not equal to checksum calculated ({})'
+                .format(checksum, crc16xmodem(raw[1:-3])))
+
+        if frame is None:
+            frame = ReceivedFrame()
+        control_byte2 = raw[2]
+        frame.sort = sort = _SORTS[control_byte2 & 0x03]
+        frame.recv_seq = raw[1] >> 1
+        frame.send_seq = control_byte2 >> 1 if sort is Frame.Sort.I else None
+        frame.type = _SFRAME_TYPES[(control_byte2 >> 2) & 0x03] if sort is Frame.Sort.S else None
+        frame.raw = raw
         return frame
 
     @staticmethod
     def get_frame_sort(control):
-        """Return Frame.Sort enum (S/I) based on 16-bit packet control bitarray."""
-        val = (control & Frame.CONTROL_MASK).uint
-        if val == 0 or val == 2:  # 00 or 10
-            return Frame.Sort.I
-        else:
-            return Frame.Sort(val)
+        """Return Frame.Sort enum (S/I) based on the 16-bit packet control
+        bitarray, or on the second control byte as an int.
+        """
+        if isinstance(control, BitArray):
+            control = (control & Frame.CONTROL_MASK).uint
+        return _SORTS[control & 0x03]
 
     @staticmethod
     def get_sframe_type(control):
-        """Return SFrameType enum based on S-frame packet control field."""
-        return SFrame.Type((control & Frame.SFRAME_MASK).uint >> 2)
+        """Return SFrameType enum based on S-frame packet control field, given
+        either as a 16-bit bitarray or as the second control byte as an int.
+        """
+        if isinstance(control, BitArray):
+            control = (control & Frame.SFRAME_MASK).uint
+        return _SFRAME_TYPES[(control >> 2) & 0x03]
 
 
 class IFrame(Frame):
@@ -139,27 +221,7 @@ class IFrame(Frame):
         info should be ascii-encoded bytes.
         """
         self.send_seq = send_seq
-
-        control_byte1 = bitstring.pack('uint:7, bool', recv_seq, p_f).uint
-        control_byte2 = bitstring.pack('uint:7, bool=0', send_seq).uint
-
-        checksum_bytes = bitstring.pack(
-            'uint:8, uint:8, bits',
-            control_byte1, control_byte2, info
-        ).bytes
-        checksum = self.calc_checksum(checksum_bytes)  # Calculated over unescaped bytes
-
-        bitarr = BitArray(bitstring.pack(
-            'uint:8, uint:8, uint:8, bits, uint:16, uint:8',
-            START_STOP_BYTE,
-            control_byte1,
-            control_byte2,
-            info,             # variable length
-            checksum,
-            START_STOP_BYTE
-        ))
-
-        super().__init__(bitarr, info=True)
+        super().__init__(pack_frame(*iframe_control(recv_seq, send_seq, p_f), info), info=True)
 
     def to_ascii(self):
         return self.info.decode('ascii')
@@ -179,25 +241,7 @@ class SFrame(Frame):
         To classify a received frame, use the Frame.make_frame method.
         """
         self.TYPE = sframe_type
-
-        control_byte1 = bitstring.pack('uint:7, bool', recv_seq, p_f).uint
-        control_byte2 = bitstring.pack('uint:4=0, uint:2, uint:2=1', sframe_type.value).uint
-
-        checksum_bytes = bitstring.pack(
-            'uint:8, uint:8',
-            control_byte1, control_byte2
-        ).bytes
-
-        bitarr = BitArray(bitstring.pack(
-            'uint:8, uint:8, uint:8, uint:16, uint:8',
-            START_STOP_BYTE,
-            control_byte1,
-            control_byte2,
-            self.calc_checksum(checksum_bytes),
-            START_STOP_BYTE
-        ))
-
-        super().__init__(bitarr, info=False)
+        super().__init__(pack_frame(*sframe_control(recv_seq, sframe_type, p_f)), info=False)
 
 
 class HFrame(Frame):
@@ -207,21 +251,96 @@ class HFrame(Frame):
         """Creates an H-frame for sending.
         To classify a received frame, use the Frame.make_frame method.
         """
-        control_byte1 = bitstring.pack('uint:7, bool=1', send_seq).uint
-        control_byte2 = 3  # 0b00000011 (RR, type H-frame)
-
-        checksum_bytes = bitstring.pack(
-            'uint:8, uint:8',
-            control_byte1, control_byte2
-        ).bytes
-
-        bitarr = BitArray(bitstring.pack(
-            'uint:8, uint:8, uint:8, uint:16, uint:8',
-            START_STOP_BYTE,                     # 0x7E
-            control_byte1,                       # receive_seq, p/f
-            control_byte2,                       # 0x03
-            self.calc_checksum(checksum_bytes),  # crc16xmodem(checksum_bytes)
-            START_STOP_BYTE                      # 0x7E
-        ))
-
-        super().__init__(bitarr, info=False)
+        super().__init__(pack_frame(*hframe_control(send_seq)), info=False)
+
+
+class ReceivedFrame:
+    __slots__ = ('sort', 'recv_seq', 'send_seq', 'type', 'raw')
+
+    def __init__(self):
+        """Compact record of a received frame, filled in by Frame.parse.
+        sort is a Frame.Sort, send_seq is None unless it is an I-frame and type
+        (an SFrame.Type) is None unless it is an S-frame. raw is the unescaped
+        frame, and payload a view of its info bytes.
+        """
+        self.sort = None
+        self.recv_seq = None
+        self.send_seq = None
+        self.type = None
+        self.raw = None
+
+    @property
+    def payload(self):
+        """Info bytes as a memoryview of raw, without copying."""
+        return memoryview(self.raw)[3:-3]
+
+    @property
+    def info(self):
+        """Info bytes as bytes, or None if it is not an I-frame."""
+        return self.raw[3:-3] if self.sort is Frame.Sort.I else None
+
+
+class FramePool:
+    def __init__(self, size=64):
+        """Reusable ReceivedFrames for high-rate receive loops, so parsing a
+        frame does not allocate a record. get() returns a free record, or a
+        new one if none are free. put() takes a record back once nothing reads
+        it any more. At most size free records are kept.
+        """
+        self.size = size
+        self._free = [ReceivedFrame() for _ in range(size)]
+
+    def get(self):
+        return self._free.pop() if self._free else ReceivedFrame()
+
+    def put(self, frame):
+        frame.raw = None   # Do not keep the last frame received alive
+        if len(self._free) < self.size:
+            self._free.append(frame)
+
+
+_SORTS = (Frame.Sort.I, Frame.Sort.S, Frame.Sort.I, Frame.Sort.H)   # Indexed by control & 0b11
+_SFRAME_TYPES = tuple(SFrame.Type)                                  # Indexed by type value
+
+
+def iframe_control(recv_seq, send_seq, p_f=1):
+    """Returns both control bytes of an I-frame as ints.
+    Byte 1 is N(R) in the top 7 bits and P/F in the lowest bit, byte 2 is N(S)
+    in the top 7 bits and 0 in the lowest bit.
+    """
+    return (recv_seq << 1) | bool(p_f), send_seq << 1
+
+
+def sframe_control(recv_seq, sframe_type, p_f=1):
+    """Returns both control bytes of an S-frame as ints. Byte 2 is 0000TT01."""
+    return (recv_seq << 1) | bool(p_f), (sframe_type.value << 2) | 0x01
+
+
+def hframe_control(send_seq):
+    """Returns both control bytes of an H-frame as ints. Byte 2 is always 0x03."""
+    return (send_seq << 1) | 0x01, 0x03
+
+
+def pack_frame(control_byte1, control_byte2, info=b''):
+    """Returns a complete, unescaped frame as bytes:
+    start byte, 2 control bytes, info, 16-bit checksum, stop byte.
+    Checksum is calculated over control and info bytes only.
+    """
+    frame = bytearray(len(info) + MIN_FRAME_LEN)
+    frame[0] = START_STOP_BYTE
+    frame[1] = control_byte1
+    frame[2] = control_byte2
+    frame[3:-3] = info
+    checksum = crc16xmodem(bytes(frame[1:-3]))
+    frame[-3] = checksum >> 8
+    frame[-2] = checksum & 0xFF
+    frame[-1] = START_STOP_BYTE
+    return bytes(frame)
+
+
+# Encoded (escaped) S-frames for every type and N(R), and H-frames for every
+# N(S), eg SFRAME_BYTES[SFrame.Type.RR][seq]. Every control frame that can
+# be sent is in these tables, so senders never build or checksum one.
+SFRAME_BYTES = {sframe_type: tuple(SFrame(seq, sframe_type).bytes for seq in range(128))
+                for sframe_type in SFrame.Type}
+HFRAME_BYTES = tuple(HFrame(seq).bytes for seq in range(128))
@@ -0,0 +1,85 @@
+"""
+Sensor payloads of I-frames.
+
+The Arduino sends each sample either as an ASCII CSV row of sink.SENSOR_COLUMNS
+or, if built with BINARY_PAYLOAD, packed little-endian as
+
+    version (B) | AcX..GyZ of 3 IMUs (18h) | voltage (H) | current (H) | power (H) | energy (I)
+
+with voltage in units of 10 mV, current in mA, power in mW and energy in mJ.
+This is 47 bytes instead of up to ~154. CSV rows start with '-' or a digit,
+so a first byte below 0x20 marks a binary payload and is its version. The
+format is chosen per frame, so both can arrive on the same link.
+"""
+
+import struct
+
+
+BINARY_VERSION = 1
+BINARY = struct.Struct('<B18hHHHI')
+N_FIELDS = 22
+SCALES = (1.0,) * 18 + (0.01, 1.0, 1.0, 0.001)   # Multiply packed fields by these to get CSV units
+
+# Matches the sprintf/dtostrf formats in arduino/main/main.ino
+FIELD_FORMATS = ('{:.0f}',) * 18 + ('{:.2f}', '{:.0f}', '{:.0f}', '{:.1f}')
+ROW_FORMAT = ','.join(FIELD_FORMATS)
+
+# BINARY as a NumPy dtype, for decoding many payloads at once
+BINARY_DTYPE = [('version', 'u1'), ('imu', '<i2', (18,)), ('voltage', '<u2'), ('current', '<u2'),
+                ('power', '<u2'), ('energy', '<u4')]
+
+
+def is_binary(info):
+    return len(info) > 0 and info[0] < 0x20
+
+
+def decode(info):
+    """Returns the N_FIELDS values of one payload, binary or CSV, as numbers in
+    the units of the CSV row. Raises ValueError if it is malformed.
+    """
+    if not is_binary(info):
+        values = [float(field) for field in info.split(b',')]
+        if len(values) != N_FIELDS:
+            raise ValueError('Payload has {} fields, expected {}'.format(len(values), N_FIELDS))
+        return values
+    if info[0] != BINARY_VERSION:
+        raise ValueError('Unsupported payload version {}'.format(info[0]))
+    if len(info) != BINARY.size:
+        raise ValueError('Binary payload of {} bytes, expected {}'.format(len(info), BINARY.size))
+    _, *values, voltage, current, power, energy = BINARY.unpack(info)   # IMU fields need no scaling
+    values += (voltage * 0.01, current, power, energy * 0.001)
+    return values
+
+
+def decode_binary(infos):
+    """Decodes a sequence of binary payloads with one NumPy call. Returns an
+    array of shape (len(infos), N_FIELDS) in the units of the CSV row.
+    """
+    import numpy as np
+
+    data = b''.join(infos)
+    if len(data) != BINARY.size * len(infos):
+        raise ValueError('Binary payloads must all be {} bytes'.format(BINARY.size))
+    records = np.frombuffer(data, dtype=BINARY_DTYPE)
+    if len(records) and (records['version'] != BINARY_VERSION).any():
+        raise ValueError('Unsupported payload version')
+    values = np.empty((len(records), N_FIELDS))
+    values[:, :18] = records['imu']
+    for i, name in enumerate(('voltage', 'current', 'power', 'energy'), 18):
+        values[:, i] = records[name] * SCALES[i]
+    return values
+
+
+def encode(values):
+    """Packs N_FIELDS values in CSV units into a binary payload, as the
+    Arduino does. Fixed-point fields are rounded.
+    """
+    fields = [int(round(value / scale)) for value, scale in zip(values, SCALES)]
+    return BINARY.pack(BINARY_VERSION, *fields)
+
+
+def to_csv(info):
+    """Returns a payload as an ascii-encoded CSV row. CSV payloads are returned as is."""
+    if not is_binary(info):
+        return info
+    return ROW_FORMAT.format(*decode(info)).encode('ascii')
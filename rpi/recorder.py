@@ -0,0 +1,145 @@
+"""
+Compact binary recording of the sensor stream.
+
+A .rec file is a header followed by fixed-size records of float32 values, one
+record per sample and one value per column. The header is
+
+    magic (8s) | version (H) | n_columns (H) | data_offset (I) | dtype (4s) | column names
+
+with column names comma-separated and zero-padded up to data_offset, which is a
+multiple of 64. Records can therefore be memory-mapped directly, eg with
+numpy.memmap(path, dtype, offset=data_offset, shape=(-1, n_columns)).
+
+`python recorder.py <file.rec> <file.csv>` converts a recording back to the CSV
+layout written by comm.py, and from_csv converts a CSV into a recording.
+"""
+
+import struct
+import sys
+from array import array
+
+import payload
+from sink import SENSOR_COLUMNS, BatchSink
+
+
+MAGIC = b'DANCEREC'
+VERSION = 1
+HEADER = struct.Struct('<8sHHI4s')
+ALIGN = 64
+DTYPE = b'<f4' if sys.byteorder == 'little' else b'>f4'   # array('f') is native float32
+
+CSV_FORMATS = dict(zip(SENSOR_COLUMNS, payload.FIELD_FORMATS))
+
+
+def write_header(f, columns):
+    """Writes the header to file f and returns data_offset."""
+    names = ','.join(columns).encode('ascii')
+    data_offset = -(-(HEADER.size + len(names) + 1) // ALIGN) * ALIGN
+    f.write(HEADER.pack(MAGIC, VERSION, len(columns), data_offset, DTYPE))
+    f.write(names.ljust(data_offset - HEADER.size, b'\0'))
+    return data_offset
+
+
+def read_header(f):
+    """Reads the header from the start of file f.
+    Returns (columns, dtype, data_offset), dtype as a numpy-style string.
+    """
+    magic, version, n_columns, data_offset, dtype = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError('Not a recording: {}'.format(f.name))
+    if version != VERSION:
+        raise ValueError('Unsupported recording version {}'.format(version))
+    columns = f.read(data_offset - HEADER.size).rstrip(b'\0').decode('ascii').split(',')
+    if len(columns) != n_columns:
+        raise ValueError('Header lists {} columns, expected {}'.format(len(columns), n_columns))
+    return columns, dtype.rstrip(b'\0 ').decode('ascii'), data_offset
+
+
+class BinaryRecorder(BatchSink):
+    def __init__(self, path, columns=SENSOR_COLUMNS, batch_size=512, **kwargs):
+        """Sink that decodes each I-frame payload once into float32 fields and
+        writes them as fixed-size records (see module docstring).
+        Rows are parsed into a chunk preallocated for batch_size records, which
+        is copied out once per batch. Rows with the wrong number of fields are
+        dropped and counted in n_bad_rows.
+        """
+        super().__init__(path, batch_size=batch_size, **kwargs)
+        self.n_columns = len(columns)
+        self.n_bad_rows = 0
+        self._chunk = array('f', bytes(4 * self.n_columns * batch_size))
+        write_header(self._file, columns)
+
+    def _add(self, info):
+        try:
+            if payload.is_binary(info):   # Already numbers, no text to parse
+                row = array('f', payload.decode(info))
+            else:
+                row = array('f', map(float, info.split(b',')))
+        except ValueError:
+            row = None
+        if row is None or len(row) != self.n_columns:
+            self.n_bad_rows += 1
+            print('Dropped malformed row: {}'.format(info))
+            return False
+
+        start = self._n_queued * self.n_columns
+        self._chunk[start:start + self.n_columns] = row
+        return True
+
+    def _take_batch(self):
+        with memoryview(self._chunk) as view:
+            return view[:self._n_queued * self.n_columns].tobytes()
+
+
+def to_csv(rec_path, csv_path, rows_per_read=4096):
+    """Converts a recording to a CSV file with a header row, in the layout
+    written by comm.py.
+    """
+    with open(rec_path, 'rb') as rec, open(csv_path, 'w', newline='') as out:
+        columns, dtype, _ = read_header(rec)
+        if dtype != DTYPE.decode('ascii'):
+            raise ValueError('Recording dtype {} does not match this machine'.format(dtype))
+        row_format = ','.join(CSV_FORMATS.get(col, '{:g}') for col in columns) + '\n'
+        n_columns = len(columns)
+
+        out.write(','.join(columns) + '\n')
+        while True:
+            values = array('f')
+            data = rec.read(4 * n_columns * rows_per_read)
+            values.frombytes(data[:len(data) - len(data) % (4 * n_columns)])  # Ignore partial record
+            if not values:
+                break
+            for start in range(0, len(values), n_columns):
+                out.write(row_format.format(*values[start:start + n_columns]))
+
+
+def from_csv(csv_path, rec_path, rows_per_write=4096):
+    """Converts a CSV file with a header row, as written by comm.py, to a
+    recording. Reads the CSV line by line, so memory use does not grow with
+    file size. Lines with the wrong number of fields are skipped.
+    """
+    with open(csv_path, 'rb') as csv, open(rec_path, 'wb') as rec:
+        columns = csv.readline().decode('ascii').strip().split(',')
+        n_columns = len(columns)
+        write_header(rec, columns)
+
+        values = array('f')
+        for line in csv:
+            try:
+                row = array('f', map(float, line.split(b',')))
+            except ValueError:
+                continue
+            if len(row) == n_columns:
+                values.extend(row)
+            if len(values) >= n_columns * rows_per_write:
+                values.tofile(rec)
+                values = array('f')
+        values.tofile(rec)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print('python recorder.py <file.rec> <file.csv>')
+        sys.exit()
+
+    to_csv(sys.argv[1], sys.argv[2])
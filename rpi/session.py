@@ -0,0 +1,106 @@
+"""
+Memory-mapped access to recorded sessions, for offline training and replay.
+
+Binary recordings (.rec, see recorder.py) are mapped with numpy.memmap, so
+opening a multi-gigabyte session reads nothing until samples are used. A CSV
+session <name>.csv is first converted to <name>.csv.rec next to it, which is
+reused as long as it is newer than the CSV. It is not <name>.rec, the file
+`comm.py --bin` records to, so a recording is never overwritten or mistaken
+for the converted CSV.
+
+All indexing and window methods return read-only views into the mapping, not
+copies.
+"""
+
+import os
+
+import numpy as np
+
+from recorder import from_csv, read_header
+
+
+# TaskReadSensors in arduino/main/main.ino asks for 25 ms but, as noted there,
+# actually runs every 17-18 ms
+SAMPLE_RATE = 55  # Hz
+SAMPLE_PERIOD = 1 / SAMPLE_RATE  # Seconds
+
+
+class Session:
+    def __init__(self, path, sample_period=SAMPLE_PERIOD):
+        """Opens a .rec or .csv session. Sample i is taken to be recorded at
+        i * sample_period seconds, unless the session has a 'time' column, in
+        which case that column is used as the timestamp of each sample.
+        """
+        if path.endswith('.csv'):
+            rec_path = path + '.rec'
+            if not os.path.exists(rec_path) or os.path.getmtime(rec_path) < os.path.getmtime(path):
+                from_csv(path, rec_path)
+            path = rec_path
+
+        with open(path, 'rb') as f:
+            columns, dtype, data_offset = read_header(f)
+        self.path = path
+        self.columns = columns
+        self.sample_period = sample_period
+
+        n_columns = len(columns)
+        n_samples = (os.path.getsize(path) - data_offset) // (np.dtype(dtype).itemsize * n_columns)
+        if n_samples:
+            self.data = np.memmap(path, dtype=dtype, mode='r', offset=data_offset,
+                                  shape=(n_samples, n_columns))
+        else:  # Cannot mmap an empty region
+            self.data = np.empty((0, n_columns), dtype=dtype)
+
+        self._times = self.column('time') if 'time' in columns else None
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, key):
+        """Indexes samples like a 2D array of shape (samples, columns)."""
+        return self.data[key]
+
+    def column(self, name):
+        return self.data[:, self.columns.index(name)]
+
+    def index_at(self, t):
+        """Returns the index of the first sample at or after t seconds, clipped
+        to the session length.
+        """
+        if self._times is not None:
+            idx = int(np.searchsorted(self._times, t))
+        else:
+            idx = int(np.ceil(t / self.sample_period - 1e-9))
+        return min(max(idx, 0), len(self))
+
+    def at(self, t):
+        """Returns the sample at or just after t seconds."""
+        return self.data[min(self.index_at(t), len(self) - 1)]
+
+    def between(self, t_start, t_end):
+        """Returns samples recorded in [t_start, t_end) seconds."""
+        return self.data[self.index_at(t_start):self.index_at(t_end)]
+
+    def windows(self, size, stride=None):
+        """Returns all full windows of size samples, stride samples apart
+        (default: non-overlapping), as one read-only array of shape
+        (n_windows, size, columns). Window i starts at sample i * stride.
+        """
+        stride = stride or size
+        n_windows = max((len(self) - size) // stride + 1, 0)
+        row_stride, col_stride = self.data.strides
+        return np.lib.stride_tricks.as_strided(
+            self.data, shape=(n_windows, size, len(self.columns)),
+            strides=(stride * row_stride, row_stride, col_stride), writeable=False)
+
+    def iter_windows(self, size, stride=None):
+        """Yields (start_index, window) for each window returned by windows()."""
+        stride = stride or size
+        for i, window in enumerate(self.windows(size, stride)):
+            yield i * stride, window
+
+    def close(self):
+        """Drops the mapping. The file is unmapped once views returned earlier
+        are no longer referenced either.
+        """
+        self.data = self._times = None
@@ -0,0 +1,110 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from payload import to_csv
+
+
+SENSOR_COLUMNS = (
+    'AcX 1', 'AcY 1', 'AcZ 1', 'GyX 1', 'GyY 1', 'GyZ 1',
+    'AcX 2', 'AcY 2', 'AcZ 2', 'GyX 2', 'GyY 2', 'GyZ 2',
+    'AcX 3', 'AcY 3', 'AcZ 3', 'GyX 3', 'GyY 3', 'GyZ 3',
+    'voltage', 'current', 'power', 'energy',
+)
+
+
+class BatchSink:
+    def __init__(self, path, batch_size=32, flush_interval=1.0, loop=None):
+        """Base class for sinks that write I-frame payloads to a file in batches.
+        Sinks are passed to SerialProtocol, which calls write() with the info
+        bytes of every in-order I-frame, and close() when the port closes.
+
+        Rows are collected in memory and handed to a single background thread
+        once batch_size rows are waiting, or flush_interval seconds after the
+        first row of a batch if loop is given. Disk writes (slow on the Pi's SD
+        card) therefore never block the event loop. A single worker thread
+        keeps batches in order.
+
+        Subclasses implement _add(info), which queues one row and returns False
+        if it was dropped, and _take_batch(), which returns the queued rows as
+        bytes and empties the queue.
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.loop = loop
+
+        self._file = open(path, 'wb')
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._n_queued = 0
+        self._timer = None
+        self._closed = False
+
+    def write(self, info):
+        """Queues one row. info is the payload of one I-frame, an ascii-encoded
+        CSV row without newline or a binary payload (see payload.py).
+        """
+        if not self._add(info):
+            return
+        self._n_queued += 1
+        if self._n_queued >= self.batch_size:
+            self.flush()
+        elif self._timer is None and self.loop is not None:
+            self._timer = self.loop.call_later(self.flush_interval, self.flush)
+
+    def flush(self):
+        """Hands all queued rows to the writer thread without waiting for them."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._n_queued and not self._closed:
+            future = self._executor.submit(self._write_batch, self._take_batch())
+            future.add_done_callback(self._check_write)
+            self._n_queued = 0
+
+    def close(self):
+        """Writes out everything queued and closes the file. Blocks until done.
+        Safe to call more than once.
+        """
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._executor.shutdown(wait=True)
+        self._file.close()
+
+    def _write_batch(self, batch):
+        """Runs on the writer thread."""
+        self._file.write(batch)
+        self._file.flush()
+
+    def _check_write(self, future):
+        if future.exception() is not None:
+            print('Failed to write to {}: {}'.format(self._file.name, future.exception()))
+
+
+class CsvSink(BatchSink):
+    def __init__(self, path, header=SENSOR_COLUMNS, **kwargs):
+        """Writes I-frame payloads as lines of a CSV file. CSV payloads are
+        written as is and binary payloads are formatted as the Arduino formats
+        CSV rows. Malformed binary payloads are dropped and counted in
+        n_bad_rows.
+        """
+        super().__init__(path, **kwargs)
+        self.n_bad_rows = 0
+        self._batch = []
+        if header:
+            self._file.write(','.join(header).encode('ascii') + b'\n')
+
+    def _add(self, info):
+        try:
+            row = to_csv(info)
+        except ValueError:
+            self.n_bad_rows += 1
+            print('Dropped malformed row: {}'.format(info))
+            return False
+        self._batch.append(row)
+        self._batch.append(b'\n')
+        return True
+
+    def _take_batch(self):
+        batch = b''.join(self._batch)
+        self._batch = []
+        return batch
@@ -0,0 +1,62 @@
+import unittest
+
+from circ_buffer import CircularBuffer
+
+
+class TestCircularBuffer(unittest.TestCase):
+    def setUp(self):
+        self.buf = CircularBuffer(16)
+
+    def test_write_wraps(self):
+        self.buf.write(b'\x00' * 10)
+        self.buf.read_until(0, ignore_first_byte=False)
+        for _ in range(9):
+            self.buf.read()
+        self.buf.write(b'\x01\x02\x03\x04\x05\x06\x07\x08')  # Wraps at index 16
+        assert(self.buf.load == 8)
+        assert(self.buf.write_idx == 2)
+        assert(bytes(self.buf.read() for _ in range(8)) == b'\x01\x02\x03\x04\x05\x06\x07\x08')
+
+    def test_read_until(self):
+        self.buf.write(b'\x7E\x01\x02\x7E\x7E\x03')
+        assert(self.buf.read_until(0x7E, ignore_first_byte=True) == b'\x7E\x01\x02\x7E')
+        assert(self.buf.read_until(0x7E, ignore_first_byte=True) is None)  # No stop byte yet
+        assert(self.buf.load == 2)
+        self.buf.write(b'\x7E')
+        assert(self.buf.read_until(0x7E, ignore_first_byte=True) == b'\x7E\x03\x7E')
+        assert(self.buf.load == 0)
+
+    def test_read_until_across_wrap(self):
+        self.buf.write(b'\x00' * 12)
+        self.buf.read_until(0, ignore_first_byte=False)
+        for _ in range(11):
+            self.buf.read()
+        self.buf.write(b'\x7E\x01\x02\x03\x04\x05\x7E')  # Stop byte after wrap
+        assert(self.buf.read_until(0x7E, ignore_first_byte=True) == b'\x7E\x01\x02\x03\x04\x05\x7E')
+        assert(self.buf.read_idx == self.buf.write_idx == 3)
+
+    def test_expand_unwraps(self):
+        self.buf.write(b'\x00' * 12)
+        for _ in range(12):
+            self.buf.read()
+        self.buf.write(b'\x01\x02\x03\x04\x05\x06\x07\x08')   # Wrapped, read_idx 12
+        self.buf.write(b'\x09\x0A\x0B\x0C\x0D\x0E\x7E')       # Load 15 of 16, must expand
+        assert(self.buf.maxlen == 32)
+        assert(self.buf.read_idx == 0)
+        assert(self.buf.n_expansions == 1)
+        assert(self.buf.high_water_mark == 15)
+        assert(self.buf.read_until(0x7E, ignore_first_byte=False) == bytes(range(1, 15)) + b'\x7E')
+
+    def test_max_capacity(self):
+        buf = CircularBuffer(16, max_capacity=32)
+        buf.write(b'\x00' * 30)
+        assert(buf.maxlen == 32)
+        with self.assertRaises(BufferError):
+            buf.write(b'\x00' * 3)
+        assert(buf.load == 30)   # Nothing written on failure
+        buf.write(b'\x00' * 2)   # Can fill to 100% at the cap
+        assert(buf.load == 32)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from classifier import ClassifierEngine, KNNModel, LinearModel, TreeModel, load_model, save_model
+
+
+class TestModels(unittest.TestCase):
+    def setUp(self):
+        self.X = np.array([[0., 0.], [1., 1.], [10., 10.], [11., 11.]])
+
+    def test_linear(self):
+        model = LinearModel(classes=['a', 'b'], coef=[[-1., -1.], [1., 1.]], intercept=[10., -10.])
+        assert(model.predict_proba(self.X).argmax(axis=1).tolist() == [0, 0, 1, 1])
+
+    def test_knn(self):
+        model = KNNModel(classes=['a', 'b'], X_train=self.X, y_train=[0, 0, 1, 1], k=3)
+        proba = model.predict_proba([[0.5, 0.5], [10.5, 10]])
+        assert(np.allclose(proba, [[2/3, 1/3], [1/3, 2/3]]))
+
+    def test_tree(self):
+        # Root splits on feature 1 <= 5, right child splits on feature 0 <= 10.5
+        model = TreeModel(classes=['a', 'b', 'c'], feature=[1, -2, 0, -2, -2],
+                          threshold=[5., 0., 10.5, 0., 0.], left=[1, -1, 3, -1, -1],
+                          right=[2, -1, 4, -1, -1], value=[[0, 0, 0], [4, 0, 0], [0, 0, 0], [0, 3, 1], [0, 0, 2]])
+        assert(model.predict_proba(self.X).argmax(axis=1).tolist() == [0, 0, 1, 2])
+
+    def test_save_load(self):
+        model = LinearModel(classes=['a', 'b'], coef=[[-1., -1.], [1., 1.]], intercept=[10., -10.],
+                            mean=np.zeros(2), scale=np.ones(2))
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'model.npz')
+            save_model(path, model)
+            loaded = load_model(path)
+        assert(isinstance(loaded, LinearModel))
+        assert(np.allclose(loaded.predict_proba(self.X), model.predict_proba(self.X)))
+
+
+class TestClassifierEngine(unittest.TestCase):
+    def setUp(self):
+        self.model = LinearModel(classes=['a', 'b'], coef=[[-1.], [1.]], intercept=[0., 0.])
+        self.reported = []
+        self.engine = ClassifierEngine(self.model, on_prediction=self.reported.append,
+                                       min_confidence=0.9, n_agree=2, cooldown=60)
+
+    def test_debounce(self):
+        for i, x in enumerate([5, 0, 5, 5, 5, 5, -5, -5]):   # 0 is not confident
+            self.engine.submit(np.array([x]), i)
+        assert([p.action for p in self.reported] == ['b'])   # Cooldown blocks 'a'
+        assert(self.reported[0].n_samples == 3)
+        assert(self.reported[0].latency >= 0)
+
+    def test_batching(self):
+        loop = asyncio.new_event_loop()
+        self.engine.loop = loop
+        for i in range(3):
+            self.engine.submit(np.array([5.]), i)
+        assert(self.engine.n_windows == 0)   # Deferred until the loop runs
+        loop.run_until_complete(asyncio.sleep(0))
+        loop.close()
+        assert(self.engine.n_batches == 1)
+        assert(self.engine.n_windows == 3)
+        assert(len(self.reported) == 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
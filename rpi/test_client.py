@@ -0,0 +1,102 @@
+import asyncio
+import base64
+import unittest
+
+from Crypto.Cipher import AES
+
+from client import AsyncClient, MessageEncoder
+
+
+class PlainClient(AsyncClient):
+    def encrypt(self, message):
+        return message.encode('utf8')
+
+
+class TestMessageEncoder(unittest.TestCase):
+    def test_encode(self):
+        key = b'0123456789abcdef'
+        encoder = MessageEncoder(key)
+        ivs = set()
+        for message in ('#wipers|1|2|3|4', '#' + 'x' * 40, 'exactly 16 bytes'):
+            data = base64.b64decode(encoder.encode(message))
+            ivs.add(data[:16])
+            plain = AES.new(key, AES.MODE_CBC, data[:16]).decrypt(data[16:])
+            pad = plain[-1]
+            assert(1 <= pad <= 16 and plain[-pad:] == bytes([pad]) * pad)
+            assert(plain[:-pad] == message.encode('utf8'))
+        assert(len(ivs) == 3)
+
+
+class TestAsyncClient(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.received = bytearray()
+
+    def tearDown(self):
+        self.loop.close()
+
+    async def handle(self, reader, writer):
+        self.received += await reader.read()
+        writer.close()
+
+    def test_queue_bounded(self):
+        client = PlainClient('127.0.0.1', 1, '0' * 16, max_queue=2)
+        for action in ('a', 'b', 'c'):
+            client.send(action)
+        assert(client.n_dropped == 1)
+        assert(client.queue.qsize() == 2)
+
+    def test_framed(self):
+        client = PlainClient('127.0.0.1', 1, '0' * 16, framed=True)
+        client.send('a')
+        message, _ = client.queue.get_nowait()
+        assert(message == b'\x00\n#a|0|0|0|0')
+
+    async def close_at_once(self, reader, writer):
+        writer.close()
+
+    def test_backoff_after_close(self):
+        async def run():
+            server = await asyncio.start_server(self.close_at_once, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            client = PlainClient('127.0.0.1', port, '0' * 16, min_backoff=0.05)
+            task = client.start()
+            await asyncio.sleep(0.3)   # Waits 0.05, 0.1, 0.2 s after the closes
+            task.cancel()
+            server.close()
+            await server.wait_closed()
+            return client
+
+        client = self.loop.run_until_complete(run())
+        assert(1 <= client.n_connects <= 4)
+
+    def test_reconnect(self):
+        async def run():
+            server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            server.close()
+            await server.wait_closed()
+
+            client = PlainClient('127.0.0.1', port, '0' * 16, min_backoff=0.01)
+            client.send('wipers')   # Queued while server is down
+            client.start()
+            await asyncio.sleep(0.05)
+            assert(client.n_connects == 0)
+
+            server = await asyncio.start_server(self.handle, '127.0.0.1', port)
+            await asyncio.sleep(0.2)
+            client.send('chicken')
+            await client.end()
+            server.close()
+            await server.wait_closed()
+            await asyncio.sleep(0.05)
+            return client
+
+        client = self.loop.run_until_complete(run())
+        assert(client.n_connects == 1)
+        assert(client.n_sent == 3)
+        assert(bytes(self.received) == b'#wipers|0|0|0|0#chicken|0|0|0|0#logout|0|0|0|0')
+
+
+if __name__ == '__main__':
+    unittest.main()
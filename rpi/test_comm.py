@@ -1,15 +1,143 @@
+import asyncio
 import unittest
 
-from comm import SerialProtocol
-from framing import HFrame
+from comm import SerialProtocol, power_details
+from framing import Frame, FramePool, HFrame, IFrame, SFrame
 
 
-class TestComm(unittest.TestCase):
+class ListSink:
+    def __init__(self):
+        self.rows = []
+
+    def write(self, info):
+        self.rows.append(info)
+
+
+class ProtocolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.sink = ListSink()
+
+        self.proto = self.make_protocol(reorder_window=4)
+
+    def make_protocol(self, **kwargs):
+        async def make():   # Starts its sender task on self.loop
+            return SerialProtocol(sinks=[self.sink], **kwargs)
+        return self.loop.run_until_complete(make())
+
+    def tearDown(self):
+        for task in asyncio.all_tasks(self.loop):
+            task.cancel()
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.loop.close()
+
+    def receive(self, *seqs):
+        for seq in seqs:
+            self.proto._handle_frame(Frame.parse(IFrame(0, seq, str(seq).encode()).bytes))
+
+    def sent(self):
+        """Returns the S-frames queued for the Arduino as (type, N(R)) pairs."""
+        frames = []
+        while not self.proto.queue.empty():
+            fr = Frame.make_frame(self.proto.queue.get_nowait())
+            frames.append((fr.TYPE, fr.recv_seq))
+        return frames
+
+    def srejs(self):
+        return [seq for sframe_type, seq in self.sent() if sframe_type == SFrame.Type.SREJ]
+
+    def delivered(self):
+        return [int(info) for info in self.sink.rows]
+
+
+class ListTransport:
+    def __init__(self):
+        self.written = []
+
+    def write(self, data):
+        self.written.append(data)
+
+
+class TestComm(ProtocolTestCase):
     def test_data_received(self):
+        async def connect():   # Starts the handshake task on self.loop
+            self.proto.connection_made(ListTransport())
+        self.loop.run_until_complete(connect())
+
         handshake = HFrame(1).bytes
-        proto = SerialProtocol()
         for byte in handshake:
-            proto.data_received([byte])
+            self.proto.data_received([byte])
+        assert(self.proto._ready.is_set())
+
+
+class TestSelectiveRepeat(ProtocolTestCase):
+    def test_gap_filled(self):
+        self.receive(1, 2, 4, 6)
+        assert(self.delivered() == [1, 2])
+        assert(self.srejs() == [3, 5])    # Each missing frame requested once
+        self.receive(3)                   # Releases 3 and 4
+        assert(self.delivered() == [1, 2, 3, 4] and self.proto.recv_seq == 4)
+        self.receive(4, 5)                # 4 is a duplicate
+        assert(self.delivered() == [1, 2, 3, 4, 5, 6])
+        stats = self.proto.stats()
+        assert(stats['duplicates'] == 1 and stats['reordered'] == 2 and stats['held'] == 0)
+        assert(self.srejs() == [])
+
+    def test_gap_skipped_and_wraparound(self):
+        self.proto.recv_seq = 125
+        self.receive(127, 0, 1, 2)        # 126 never arrives, 2 is 4 ahead of it
+        assert(self.srejs() == [126])
+        assert(self.delivered() == [127, 0, 1, 2])
+        assert(self.proto.stats()['lost'] == 1 and self.proto.rej_seqs == set())
+
+
+class TestAckPolicy(ProtocolTestCase):
+    def test_ack_every(self):
+        self.proto = self.make_protocol(ack_every=4, ack_delay=10)
+        self.receive(*range(1, 10))
+        assert(self.sent() == [(SFrame.Type.RR, 5), (SFrame.Type.RR, 9)])
+        stats = self.proto.stats()
+        assert(stats['acks_sent'] == 2 and stats['acks_per_iframe'] == 2 / 9)
+
+    def test_ack_delay(self):
+        self.proto = self.make_protocol(ack_every=4, ack_delay=0.01)
+        self.receive(1)
+        assert(self.sent() == [])
+        self.loop.run_until_complete(asyncio.sleep(0.03))
+        assert(self.sent() == [(SFrame.Type.RR, 2)])
+
+    def test_window_nearly_full(self):
+        self.proto = self.make_protocol(ack_every=None, ack_delay=10, ack_window=6)
+        self.receive(1, 2, 4, 5, 6)   # 3 missing, Arduino holds 1 to 6
+        assert(self.sent() == [(SFrame.Type.SREJ, 3), (SFrame.Type.RR, 3)])
+        self.receive(3)
+        assert(self.sent() == [])     # 4 delivered since the last RR, none waiting
+        with self.assertRaises(ValueError):
+            self.make_protocol(ack_every=16)
+
+
+class TestFramePool(ProtocolTestCase):
+    def test_records_returned(self):
+        pool = FramePool(size=2)
+        self.proto = self.make_protocol(pool=pool)
+        self.proto.data_received(IFrame(0, 1, b'1').bytes)
+        assert(self.delivered() == [1])
+        assert(len(pool._free) == 2)
+
+        self.sink.write = None   # Sink raises TypeError
+        with self.assertRaises(TypeError):
+            self.proto.data_received(IFrame(0, 2, b'2').bytes)
+        assert(len(pool._free) == 2)
+
+
+class TestPowerDetails(unittest.TestCase):
+    def test_power_details(self):
+        fields = b'0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,4.98,512,2549,1234.5'.split(b',')
+        assert(power_details(fields) == {'voltage': '4.98', 'current': '512', 'power': '2549', 'cumpower': '1234.5'})
+        assert(power_details([0] * 18 + [4.98, 512, 2549, 1234.5])['voltage'] == '4.98')
+        assert(power_details(fields[:20]) is None)
+        assert(power_details(fields[:18] + [b'\xff'] * 4) is None)
+        assert(power_details(None) is None)
 
 
 if __name__ == '__main__':
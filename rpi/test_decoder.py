@@ -0,0 +1,65 @@
+import unittest
+
+from decoder import FrameDecoder
+from framing import Frame, FramePool, IFrame, SFrame, HFrame
+
+
+class TestFrameDecoder(unittest.TestCase):
+    def setUp(self):
+        self.decoder = FrameDecoder(64)
+        self.ifr = IFrame(2, 5, b'1,2,3')
+        self.sfr = SFrame(3, SFrame.Type.RR)
+        self.hfr = HFrame(1)
+
+    def test_multiple_frames_per_chunk(self):
+        self.decoder.feed(self.hfr.bytes + self.ifr.bytes + self.sfr.bytes)
+        frames = list(self.decoder)
+        assert([fr.SORT for fr in frames] == [Frame.Sort.H, Frame.Sort.I, Frame.Sort.S])
+        assert(frames[1].info == b'1,2,3')
+        assert(self.decoder.n_frames == 3)
+
+    def test_byte_by_byte(self):
+        frames = []
+        for byte in self.ifr.bytes + self.hfr.bytes:
+            self.decoder.feed(bytes([byte]))
+            frames.extend(self.decoder)
+        assert([fr.SORT for fr in frames] == [Frame.Sort.I, Frame.Sort.H])
+
+    def test_resync(self):
+        bad = bytearray(self.ifr.bytes)
+        bad[4] ^= 0x01  # Corrupt info, checksum no longer matches
+        truncated = self.sfr.bytes[:-2]  # Stop byte and part of checksum lost
+
+        self.decoder.feed(b'\x01\x02' + bytes(bad) + truncated + self.hfr.bytes)
+        frames = list(self.decoder)
+        assert(len(frames) == 1)
+        assert(frames[0].SORT == Frame.Sort.H)
+        assert(self.decoder.n_discarded == 2)
+        assert(self.decoder.n_errors == 2)
+
+    def test_overflow(self):
+        decoder = FrameDecoder(16, max_capacity=32)
+        decoder.feed(b'\x7E' + b'\x01' * 20)   # Partial frame
+        decoder.feed(b'\x02' * 20)              # Does not fit, buffer cleared
+        decoder.feed(self.hfr.bytes)
+        frames = list(decoder)
+        assert([fr.SORT for fr in frames] == [Frame.Sort.H])
+        assert(decoder.n_overflows == 1)
+        assert(decoder.n_discarded == 41)
+
+    def test_pool(self):
+        pool = FramePool(size=2)
+        decoder = FrameDecoder(64, pool=pool)
+        decoder.feed(self.hfr.bytes + self.ifr.bytes + self.sfr.bytes)
+        sorts = []
+        for fr in decoder:
+            sorts.append(fr.sort)
+            if fr.sort == Frame.Sort.I:
+                assert(fr.info == b'1,2,3')
+            pool.put(fr)
+        assert(sorts == [Frame.Sort.H, Frame.Sort.I, Frame.Sort.S])
+        assert(len(pool._free) == 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
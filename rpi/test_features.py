@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+
+from features import FeatureExtractor
+from payload import encode
+
+
+class TestFeatureExtractor(unittest.TestCase):
+    def setUp(self):
+        self.emitted = []
+        self.fx = FeatureExtractor(window=8, hop=3, n_axes=2, bands=((0, 10), (10, 20)), sample_period=0.025,
+                                   on_features=lambda f, n: self.emitted.append(n))
+        self.samples = np.random.RandomState(0).randint(-16384, 16384, size=(40, 2)).astype(float)
+
+    def test_hops(self):
+        for sample in self.samples[:14]:
+            self.fx.push(sample)
+        assert(self.emitted == [8, 11, 14])
+
+    def test_matches_batch(self):
+        for sample in self.samples[:38]:
+            features = self.fx.push(sample)
+        window = self.samples[30:38]
+        diff = np.diff(window, axis=0)
+        power = np.abs(np.fft.rfft(window - window.mean(axis=0), axis=0)) ** 2 / 8
+        expected = np.concatenate((
+            window.mean(axis=0), window.std(axis=0), window.min(axis=0), window.max(axis=0),
+            (window ** 2).mean(axis=0), np.sqrt((diff ** 2).mean(axis=0)) / 0.025,
+            power[:2].sum(axis=0), power[2:4].sum(axis=0),   # rfftfreq(8, 0.025) = 0, 5, 10, 15, 20 Hz
+        ))
+        assert(np.allclose(features, expected))
+        assert(len(features) == len(self.fx.feature_names()))
+
+    def test_write(self):
+        self.fx.write(b'1,2,3')
+        self.fx.write(b'1,x')
+        self.fx.write(encode([3, -4] + [0] * 16 + [4.98, 512, 2549, 1234.5]))
+        assert(np.allclose(self.fx.last_fields[:2], [3, -4]))
+        self.fx.write(b'\x01\x02')   # Truncated binary payload
+        assert(self.fx.n_samples == 2)
+        assert(self.fx.n_bad_rows == 2)
+        assert(self.fx.last_fields is None)
+
+    def test_default_bands(self):
+        fx = FeatureExtractor(sample_period=0.025)
+        assert(fx.bands == ((0.5, 3), (3, 6), (6, 10), (10, 20)))
+
+
+if __name__ == '__main__':
+    unittest.main()
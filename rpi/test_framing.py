@@ -3,7 +3,7 @@ from unittest import skip
 
 from bitstring import BitStream, BitArray
 
-from framing import Frame, IFrame, SFrame, HFrame
+from framing import HFRAME_BYTES, SFRAME_BYTES, Frame, FramePool, IFrame, SFrame, HFrame, crc16xmodem
 
 
 class TestFraming(unittest.TestCase):
@@ -39,6 +39,14 @@ class TestFraming(unittest.TestCase):
         assert(out5 == b'\x7E\x12\x3A\x4B\x7E')  # don't escape start and end chars
         assert(Frame.unescape(out5) == in5)
 
+        in6 = b'\x7E\x12\x7D\x7E'      # escape char second from the end
+        out6 = Frame.escape(in6)
+        assert(out6 == b'\x7E\x12\x7D\x5D\x7E')
+        assert(Frame.unescape(out6) == in6)
+
+        with self.assertRaises(ValueError):
+            Frame.unescape(b'\x7E\x12\x7D\x4B\x7E')  # 4B should not be escaped
+
     def test_make_iframe(self):
         fr = Frame.make_frame(self.ifr.bytes)
         assert(fr.SORT == Frame.Sort.I)
@@ -71,6 +79,75 @@ class TestFraming(unittest.TestCase):
         assert(Frame.get_frame_sort(BitStream(self.ifr.bitarr[8:24])) == Frame.Sort.I)
         assert(Frame.get_frame_sort(BitStream(self.sfr.bitarr[8:24])) == Frame.Sort.S)
         assert(Frame.get_frame_sort(BitStream(self.hfr.bitarr[8:24])) == Frame.Sort.H)
+        assert(Frame.get_frame_sort(self.ifr.raw[2]) == Frame.Sort.I)
+        assert(Frame.get_frame_sort(self.sfr.raw[2]) == Frame.Sort.S)
+        assert(Frame.get_frame_sort(self.hfr.raw[2]) == Frame.Sort.H)
+
+    def test_pack_frame(self):
+        assert(self.hfr.raw == b'\x7E\x03\x03' + self.hfr.raw[3:5] + b'\x7E')
+        assert(self.sfr.bitarr == BitArray(bytes=self.sfr.raw))
+        assert(Frame.get_sframe_type(self.sfr.control) == SFrame.Type.RR)
+
+        fr = Frame.make_frame(IFrame(127, 126, b'').bytes)
+        assert(fr.recv_seq == 127)
+        assert(fr.send_seq == 126)
+        assert(fr.info == b'')
+
+    def test_make_frame_keeps_received_bytes(self):
+        received = self.ifr.bytes
+        fr = Frame.make_frame(received)
+        assert(fr.bytes == received)
+        assert(fr.raw == self.ifr.raw)
+        assert(fr.info == b'\x12\x7D\x4B')
+
+    def test_parse(self):
+        fr = Frame.parse(self.ifr.bytes)
+        assert(fr.sort == Frame.Sort.I)
+        assert((fr.recv_seq, fr.send_seq, fr.type) == (2, 5, None))
+        assert(fr.info == b'\x12\x7D\x4B')
+        assert(bytes(fr.payload) == b'\x12\x7D\x4B')
+        assert(not hasattr(fr, '__dict__'))
+
+        fr = Frame.parse(self.sfr.bytes)
+        assert((fr.sort, fr.recv_seq, fr.type, fr.info) == (Frame.Sort.S, 3, SFrame.Type.RR, None))
+        fr = Frame.parse(self.hfr.bytes)
+        assert((fr.sort, fr.recv_seq, fr.send_seq) == (Frame.Sort.H, 1, None))
+
+        bad = bytearray(self.ifr.bytes)
+        bad[3] ^= 0x01
+        with self.assertRaises(ValueError):
+            Frame.parse(bytes(bad))
+
+    def test_frame_pool(self):
+        pool = FramePool(size=1)
+        record = pool.get()
+        fr = Frame.parse(self.ifr.bytes, record)
+        assert(fr is record)
+        pool.put(fr)
+        assert(fr.raw is None)
+
+        fr = Frame.parse(self.sfr.bytes, pool.get())
+        assert(fr is record)
+        assert((fr.sort, fr.send_seq, fr.type) == (Frame.Sort.S, None, SFrame.Type.RR))
+        assert(pool.get() is not record)   # Pool is empty, new record
+        pool.put(fr)
+        pool.put(Frame.parse(self.hfr.bytes))  # Pool is full, dropped
+        assert(len(pool._free) == 1)
+
+    def test_crc16xmodem(self):
+        assert(crc16xmodem(b'123456789') == 0x31C3)
+        assert(crc16xmodem(b'') == 0)
+        assert(crc16xmodem(b'56789', crc16xmodem(b'1234')) == 0x31C3)
+        assert(self.ifr.checksum == crc16xmodem(self.ifr.raw[1:-3]))
+
+    def test_control_frame_tables(self):
+        for seq in (0, 1, 63, 126, 127):
+            assert(HFRAME_BYTES[seq] == HFrame(seq).bytes)
+            for sframe_type in SFrame.Type:
+                assert(SFRAME_BYTES[sframe_type][seq] == SFrame(seq, sframe_type).bytes)
+        fr = Frame.make_frame(SFRAME_BYTES[SFrame.Type.SREJ][42])
+        assert(fr.recv_seq == 42)
+        assert(Frame.get_sframe_type(fr.control) == SFrame.Type.SREJ)
 
 
 if __name__ == '__main__':
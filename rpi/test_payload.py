@@ -0,0 +1,43 @@
+import unittest
+
+import numpy as np
+
+import payload
+
+
+class TestPayload(unittest.TestCase):
+    def setUp(self):
+        self.row = b'-1234,567,16384,-250,13,-7,1,2,3,4,5,6,-16384,0,9,8,7,6,4.98,512,2549,1234.5'
+        self.values = [float(field) for field in self.row.split(b',')]
+        self.binary = payload.encode(self.values)
+
+    def test_binary(self):
+        assert(len(self.binary) == 47)
+        assert(payload.is_binary(self.binary))
+        assert(not payload.is_binary(self.row))
+        assert(not payload.is_binary(b''))
+        assert(np.allclose(payload.decode(self.binary), self.values))
+        assert(payload.decode(self.row) == self.values)
+        assert(payload.to_csv(self.binary) == self.row)
+        assert(payload.to_csv(self.row) == self.row)
+
+    def test_decode_binary(self):
+        other = payload.encode([0] * 18 + [5.0, 0, 0, 0.001])
+        values = payload.decode_binary([self.binary, other])
+        assert(values.shape == (2, payload.N_FIELDS))
+        assert(np.allclose(values[0], payload.decode(self.binary)))
+        assert(np.allclose(values[1], payload.decode(other)))
+
+    def test_malformed(self):
+        with self.assertRaises(ValueError):
+            payload.decode(self.binary[:-1])
+        with self.assertRaises(ValueError):
+            payload.decode(b'\x02' + self.binary[1:])   # Unknown version
+        with self.assertRaises(ValueError):
+            payload.decode(b'1,2,3')
+        with self.assertRaises(ValueError):
+            payload.decode_binary([self.binary, b'\x02' + self.binary[1:]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+
+from payload import encode
+from recorder import BinaryRecorder, read_header, to_csv
+from sink import SENSOR_COLUMNS
+
+
+class TestBinaryRecorder(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.rec_path = os.path.join(self.dir.name, 'session.rec')
+        self.csv_path = os.path.join(self.dir.name, 'session.csv')
+        self.rows = [
+            b'-1234,567,16384,-250,13,-7,1,2,3,4,5,6,-16384,0,9,8,7,6,4.98,512,2549,1234.5',
+            b'0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,5.00,0,0,1234.6',
+        ]
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_round_trip(self):
+        rec = BinaryRecorder(self.rec_path, batch_size=1)
+        rec.write(self.rows[0])
+        rec.write(b'1,2,3')   # Wrong number of fields
+        rec.write(encode([float(field) for field in self.rows[1].split(b',')]))   # Binary payload
+        rec.close()
+        assert(rec.n_bad_rows == 1)
+
+        with open(self.rec_path, 'rb') as f:
+            columns, dtype, data_offset = read_header(f)
+        assert(columns == list(SENSOR_COLUMNS))
+        assert(data_offset % 64 == 0)
+        assert(os.path.getsize(self.rec_path) == data_offset + 2 * 4 * len(columns))
+
+        to_csv(self.rec_path, self.csv_path)
+        with open(self.csv_path, 'rb') as f:
+            lines = f.read().splitlines()
+        assert(lines[0] == ','.join(SENSOR_COLUMNS).encode('ascii'))
+        assert(lines[1:] == self.rows)
+
+
+if __name__ == '__main__':
+    unittest.main()
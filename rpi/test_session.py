@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from recorder import BinaryRecorder
+from session import Session
+from sink import CsvSink
+
+
+class TestSession(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'session')
+        self.rows = [','.join(str(i * 100 + col) for col in range(22)).encode('ascii')
+                     for i in range(10)]
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def record(self, sink):
+        for row in self.rows:
+            sink.write(row)
+        sink.close()
+
+    def test_rec(self):
+        self.record(BinaryRecorder(self.path + '.rec'))
+        session = Session(self.path + '.rec', sample_period=0.5)
+        assert(len(session) == 10)
+        assert(session[3, 0] == 300)
+        assert(session.column('AcY 1')[2] == 201)
+        assert(session.index_at(1.0) == 2)
+        assert(session.at(1.2)[0] == 300)
+        assert(session.between(1.0, 2.0)[:, 0].tolist() == [200, 300])
+
+        windows = session.windows(4, stride=3)
+        assert(windows.shape == (3, 4, 22))
+        assert(windows[2, 0, 0] == 600)
+        assert(np.shares_memory(windows, session.data))
+        assert([start for start, _ in session.iter_windows(4)] == [0, 4])
+        session.close()
+
+    def test_csv(self):
+        with open(self.path + '.rec', 'wb') as f:   # Recording of the same session, left alone
+            f.write(b'recording')
+        self.record(CsvSink(self.path + '.csv'))
+        session = Session(self.path + '.csv')
+        assert(session.path == self.path + '.csv.rec')
+        assert(session[9, 21] == 921)
+        session.close()
+        with open(self.path + '.rec', 'rb') as f:
+            assert(f.read() == b'recording')
+
+
+if __name__ == '__main__':
+    unittest.main()
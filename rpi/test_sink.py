@@ -0,0 +1,32 @@
+import os
+import tempfile
+import unittest
+
+from payload import encode
+from sink import CsvSink
+
+
+class TestCsvSink(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_write_batches(self):
+        sink = CsvSink(self.path, header=('a', 'b'), batch_size=2)
+        sink.write(b'1,2')
+        sink.write(b'3,4')   # Batch full, handed to writer thread
+        sink.write(b'5,6')   # Still queued
+        sink.write(encode([7] * 18 + [4.98, 512, 2549, 1234.5]))   # Binary payload, written as CSV
+        sink.write(b'\x02' + bytes(46))   # Unknown binary payload version, dropped
+        sink.close()
+        sink.close()         # Second close is a no-op
+        with open(self.path, 'rb') as f:
+            assert(f.read() == b'a,b\n1,2\n3,4\n5,6\n' + b'7,' * 18 + b'4.98,512,2549,1234.5\n')
+        assert(sink.n_bad_rows == 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+"""
+Append-only log of the moves made in an evaluation run.
+
+The CSV log (log<groupID>.csv) has a header row of LOG_COLUMNS and one row per
+move, as performanceMetrics.py reads it. Optionally every row is also appended
+to a compact binary log: a header
+
+    magic (8s) | version (H) | n_names (H) | data_offset (I) | action names
+
+with names comma-separated and zero-padded up to data_offset (a multiple of
+64), followed by one RECORD per move. Actions are stored as indices into the
+names, -1 for names not in the header. read_binary_log loads it with NumPy.
+
+Logs written by older versions are never an error while logging. A CSV log
+whose columns are the first of LOG_COLUMNS (eg from before render_delay) is
+appended to with just those columns. Any other CSV log, and a binary log of
+another version or with other action names, is renamed to log<groupID>.v<N>
+and a new log is started. read_binary_log reads only the current VERSION.
+"""
+
+import csv
+import os
+import struct
+import threading
+
+
+# render_delay is the time from the goal being set until it was shown, empty if not known (see display.py)
+LOG_COLUMNS = ['timestamp', 'action', 'goal', 'time_delta', 'correct', 'voltage', 'current', 'power',
+               'cumpower', 'render_delay']
+
+MAGIC = b'DANCELOG'
+VERSION = 1
+HEADER = struct.Struct('<8sHHI')
+ALIGN = 64
+# timestamp, time_delta, action, goal, correct, voltage, current, power, cumpower, render_delay (nan if not known)
+RECORD = struct.Struct('<ddhhB3xfffff4x')
+RECORD_DTYPE = [('timestamp', '<f8'), ('time_delta', '<f8'), ('action', '<i2'), ('goal', '<i2'),
+                ('correct', 'u1'), ('pad', 'V3'), ('voltage', '<f4'), ('current', '<f4'),
+                ('power', '<f4'), ('cumpower', '<f4'), ('render_delay', '<f4'), ('pad2', 'V4')]
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+class ActionLog:
+    def __init__(self, path, flush_interval=1.0, binary_path=None, names=(), loop=None):
+        """Keeps the log file open and appends rows to its buffer, which is
+        written out flush_interval seconds after the first unflushed row and on
+        close(). The flush timer runs on loop if given (async_eval_server.py),
+        else on a threading.Timer (final_eval_server.Server). The header row is
+        written only if the file is new or empty. Existing logs of older
+        versions are appended to or moved aside, see the module docstring.
+
+        If binary_path is given, rows are also appended there (see module
+        docstring), with actions encoded as indices into names. 'None', the
+        action logged on timeouts, is always added to names.
+        """
+        self.flush_interval = flush_interval
+        self.loop = loop
+        self.n_rows = 0
+        self._lock = threading.Lock()  # Threaded Server logs from its own and timer threads
+        self._timer = None
+        self._closed = False
+
+        self._binary = None
+        if binary_path is not None:
+            self.names = list(dict.fromkeys(list(names) + ['None']))
+            self._codes = {name: i for i, name in enumerate(self.names)}
+            if os.path.isfile(binary_path) and os.path.getsize(binary_path):
+                try:
+                    with open(binary_path, 'rb') as f:
+                        existing, _ = _read_binary_header(f)
+                    reason = None if existing == self.names else 'written with actions {}'.format(existing)
+                except (ValueError, struct.error) as e:
+                    reason = e
+                if reason is not None:
+                    _rotate(binary_path, reason)
+            self._binary = open(binary_path, 'ab')
+            if self._binary.tell() == 0:
+                _write_binary_header(self._binary, self.names)
+
+        self.n_columns = len(LOG_COLUMNS)
+        if os.path.isfile(path) and os.path.getsize(path):
+            with open(path, newline='') as f:
+                existing = next(csv.reader(f), [])
+            if existing and existing == LOG_COLUMNS[:len(existing)]:
+                self.n_columns = len(existing)   # Older log, append the columns it has
+            else:
+                _rotate(path, 'written with columns {}'.format(existing))
+        self._file = open(path, 'a', newline='')
+        self._writer = csv.writer(self._file)
+        if self._file.tell() == 0:
+            self._writer.writerow(LOG_COLUMNS)
+
+    def write(self, timestamp, action, goal, time_delta, correct, voltage, current, power, cumpower,
+              render_delay=''):
+        with self._lock:
+            if self._closed:
+                return
+            self._writer.writerow((timestamp, action, goal, time_delta, correct, voltage, current, power,
+                                   cumpower, render_delay)[:self.n_columns])
+            if self._binary is not None:
+                self._binary.write(RECORD.pack(
+                    timestamp, time_delta, self._codes.get(action, -1), self._codes.get(goal, -1), correct,
+                    _to_float(voltage), _to_float(current), _to_float(power), _to_float(cumpower),
+                    _to_float(render_delay)))
+            self.n_rows += 1
+            if self._timer is None:
+                self._start_timer()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        """Flushes and closes the log. Safe to call more than once."""
+        with self._lock:
+            if self._closed:
+                return
+            self._flush()
+            self._closed = True
+            self._file.close()
+            if self._binary is not None:
+                self._binary.close()
+
+    def _start_timer(self):
+        if self.loop is not None:
+            self._timer = self.loop.call_later(self.flush_interval, self.flush)
+        else:
+            self._timer = threading.Timer(self.flush_interval, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._closed:
+            return
+        self._file.flush()
+        if self._binary is not None:
+            self._binary.flush()
+
+
+def _rotate(path, reason):
+    """Renames path to the first free <name>.v<N><ext>, so a new log can be started."""
+    root, ext = os.path.splitext(path)
+    n = 1
+    while os.path.exists('{}.v{}{}'.format(root, n, ext)):
+        n += 1
+    rotated = '{}.v{}{}'.format(root, n, ext)
+    os.replace(path, rotated)
+    print('Cannot append to {} ({}), moved it to {}'.format(path, reason, rotated))
+
+
+def _write_binary_header(f, names):
+    encoded = ','.join(names).encode('utf8')
+    data_offset = -(-(HEADER.size + len(encoded) + 1) // ALIGN) * ALIGN
+    f.write(HEADER.pack(MAGIC, VERSION, len(names), data_offset))
+    f.write(encoded.ljust(data_offset - HEADER.size, b'\0'))
+
+
+def _read_binary_header(f):
+    magic, version, n_names, data_offset = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError('Not a binary action log: {}'.format(f.name))
+    if version != VERSION:
+        raise ValueError('Unsupported binary action log version {}'.format(version))
+    names = f.read(data_offset - HEADER.size).rstrip(b'\0').decode('utf8').split(',')
+    if len(names) != n_names:
+        raise ValueError('Header lists {} actions, expected {}'.format(len(names), n_names))
+    return names, data_offset
+
+
+def read_binary_log(path):
+    """Returns (names, records), records as a NumPy structured array with the
+    fields of RECORD_DTYPE. A partial last record is ignored. Raises
+    ValueError for logs of another version.
+    """
+    import numpy as np
+
+    with open(path, 'rb') as f:
+        names, data_offset = _read_binary_header(f)
+    size = os.path.getsize(path) - data_offset
+    records = np.fromfile(path, dtype=RECORD_DTYPE, count=size // RECORD.size, offset=data_offset)
+    return names, records
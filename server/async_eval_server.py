@@ -0,0 +1,236 @@
+"""
+Evaluation server for several groups at once, on one asyncio event loop.
+
+Each group gets its own port and AES key (see read_groups) and a GroupSession
+with an independent shuffled action sequence, action timeout and log file
+log<groupID>.csv, in the same format as final_eval_server.py (see action_log.py). Connections are
+served without a thread per client, so dozens of groups can rehearse in one
+process.
+
+python async_eval_server.py [IP address] [groups file] [--framed] [--binlog]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+
+from action_log import ActionLog
+from message_framing import MessageReassembler
+from metrics import MetricsEngine
+from server_auth import MessageDecoder
+
+
+ACTIONS = ['wipers', 'wipers', 'wipers', 'wipers',
+           'number7', 'number7', 'number7', 'number7',
+           'chicken', 'chicken', 'chicken', 'chicken',
+           'sidestep', 'sidestep', 'sidestep', 'sidestep',
+           'turnclap', 'turnclap', 'turnclap', 'turnclap']
+TIMEOUT = 30
+
+
+def read_groups(path):
+    """Reads a groups file with one 'groupID port key' line per group. Blank
+    lines and lines starting with # are skipped. Returns a list of
+    (group_id, port, key).
+    """
+    groups = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            group_id, port, key = line.split()
+            if len(key) not in (16, 24, 32):
+                raise ValueError('AES key of group {} must be either 16, 24, or 32 bytes long'.format(group_id))
+            groups.append((group_id, int(port), key))
+    return groups
+
+
+class GroupSession:
+    def __init__(self, group_id, secret_key, actions=ACTIONS, timeout=TIMEOUT, framed=False, log_dir='.',
+                 binary_log=False):
+        """One group's evaluation run. As in final_eval_server.Server, the first
+        action is given timeout seconds after the session starts, and a new
+        action is given on every move received or after timeout seconds without
+        one. Only one connection is served at a time. A group that reconnects
+        continues where it left off. If binary_log, moves are also logged to
+        log<group_id>.bin.
+        """
+        self.group_id = group_id
+        self.secret_key = secret_key
+        self.actions = list(actions)
+        self.n_moves = len(self.actions)
+        self.indices = list(range(self.n_moves))
+        random.shuffle(self.indices)
+        self.timeout = timeout
+        self.framed = framed  # Clients send length-prefixed messages, see message_framing.py
+        self.log_path = os.path.join(log_dir, 'log{}.csv'.format(group_id))
+        self.binary_log = binary_log
+        self.decoder = MessageDecoder(secret_key)
+
+        self.action = None
+        self.action_set_time = None
+        self.x = 0
+        self.no_response = False
+        self.logout = False
+
+        self.loop = None
+        self.server = None
+        self.transport = None
+        self.timer = None
+        self.done = None
+        self.log = None
+        self.metrics = MetricsEngine()  # Updated live as moves are logged
+
+    async def start(self, ip_addr, port_num):
+        self.loop = asyncio.get_running_loop()
+        self.done = self.loop.create_future()
+        self.server = await self.loop.create_server(lambda: SessionProtocol(self), ip_addr, port_num)
+        print('starting up on %s port %s for group %s' % (ip_addr, self.port, self.group_id), file=sys.stderr)
+        self.timer = self.loop.call_later(self.timeout, self.get_action)
+
+    @property
+    def port(self):
+        return self.server.sockets[0].getsockname()[1]
+
+    def connected(self, transport):
+        """Returns False, and closes transport, if the group is already connected."""
+        if self.transport is not None:
+            print('group {} is already connected'.format(self.group_id), file=sys.stderr)
+            transport.close()
+            return False
+        self.transport = transport
+        return True
+
+    def disconnected(self, transport):
+        if transport is self.transport:
+            self.transport = None
+
+    def handle_message(self, data):
+        try:
+            move = self.decoder.decode(data)
+
+            if move.action == "logout":
+                self.logout = True
+                print("group {} :: bye bye".format(self.group_id))
+                self.stop()
+            elif len(move.action) == 0:
+                pass
+            elif self.action is None:  # Ignore if no action has been set yet
+                pass
+            else:  # If action is available log it, and then...
+                self.no_response = False
+                self.log_move_made(move.action, move.voltage, move.current, move.power, move.cumpower)
+                print("group {} :: {} :: {} :: {} :: {} :: {}".format(self.group_id, *move))
+
+                self.get_action()  # Get new action
+
+        except Exception as e:
+            print(e)
+
+    def get_action(self):
+        self.timer.cancel()
+        if self.no_response:  # If no response was sent
+            self.log_move_made("None", 0, 0, 0, 0)
+            print("group {} :: ACTION TIMEOUT".format(self.group_id))
+
+        if self.x < self.n_moves:
+            index = self.indices[self.x]
+        else:
+            index = self.n_moves - 1
+
+        self.action = self.actions[index]
+        self.x += 1
+        self.action_set_time = time.time()
+
+        print("group {} :: NEW ACTION :: {}".format(self.group_id, self.action))
+
+        self.timer = self.loop.call_later(self.timeout, self.get_action)
+        self.no_response = True
+
+    def log_move_made(self, action_made, voltage, current, power, cumpower):
+        timestamp = time.time()
+        time_delta = timestamp - self.action_set_time
+        correct = self.action == action_made
+        try:  # A failed write must not stop the next action from being given
+            if self.log is None:
+                binary_path = self.log_path[:-len('.csv')] + '.bin' if self.binary_log else None
+                self.log = ActionLog(self.log_path, binary_path=binary_path, names=self.actions, loop=self.loop)
+            self.log.write(timestamp, action_made, self.action, time_delta, correct, voltage, current, power,
+                           cumpower)
+        except (OSError, ValueError) as e:
+            print('Could not log move: {}'.format(e))
+        self.metrics.add(action_made, self.action, time_delta, correct, voltage, current, power)
+
+    def stop(self):
+        if self.timer is not None:
+            self.timer.cancel()
+        if self.transport is not None:
+            self.transport.close()
+        if self.server is not None:
+            self.server.close()
+        if self.log is not None:
+            self.log.close()
+        if self.done is not None and not self.done.done():
+            if self.metrics.n_moves:
+                print(self.metrics.report('Group {}'.format(self.group_id)))
+            self.done.set_result(None)
+
+
+class SessionProtocol(asyncio.Protocol):
+    def __init__(self, session):
+        self.session = session
+        self.reassembler = MessageReassembler(session.framed)
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        if self.session.connected(transport):
+            print('connection from', transport.get_extra_info('peername'), 'for group',
+                  self.session.group_id, file=sys.stderr)
+
+    def data_received(self, data):
+        if self.transport is not self.session.transport:
+            return
+        for msg in self.reassembler.feed(data):
+            self.session.handle_message(msg)
+            if self.session.logout:
+                break
+
+    def connection_lost(self, exc):
+        if self.transport is self.session.transport:
+            print('no more data from group', self.session.group_id, file=sys.stderr)
+        self.session.disconnected(self.transport)
+
+
+async def serve(ip_addr, groups, **kwargs):
+    """Serves every (group_id, port, key) in groups until all groups have logged
+    out. kwargs are passed to GroupSession.
+    """
+    sessions = [GroupSession(group_id, key, **kwargs) for group_id, _, key in groups]
+    try:
+        for session, (_, port_num, _) in zip(sessions, groups):
+            await session.start(ip_addr, port_num)
+        await asyncio.gather(*(session.done for session in sessions))
+    finally:
+        for session in sessions:
+            session.stop()
+
+
+if __name__ == '__main__':
+    flags = sys.argv[3:]
+    if len(sys.argv) < 3 or not set(flags) <= {'--framed', '--binlog'}:
+        print('Invalid number of arguments')
+        print('python async_eval_server.py [IP address] [groups file] [--framed] [--binlog]')
+        print('The groups file has one line per group: groupID port key')
+        print('--framed expects length-prefixed messages from the clients')
+        print('--binlog also writes binary logs, log<groupID>.bin')
+        sys.exit()
+
+    try:
+        asyncio.run(serve(sys.argv[1], read_groups(sys.argv[2]), framed='--framed' in flags,
+                          binary_log='--binlog' in flags))
+    except KeyboardInterrupt:
+        pass
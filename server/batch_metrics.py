@@ -0,0 +1,144 @@
+"""
+Metrics of many evaluation logs at once, eg after a rehearsal.
+
+`python batch_metrics.py <dir|glob|file> [...] [-j JOBS] [--per-group]` finds the
+log<groupID>.csv files and reads them in a pool of processes. Each worker
+returns one MetricsEngine (see metrics.py) per group for the logs it read,
+and these partial aggregates are merged per group and overall. Prints a summary
+table, groups ranked by accuracy and median time_delta, and moves ranked the
+same way.
+"""
+
+import argparse
+import csv
+import glob
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from metrics import MetricsEngine
+
+
+LOG_NAME = re.compile(r'log(.+)\.csv$')
+
+
+def find_logs(patterns):
+    """Expands directories (to the log*.csv files anywhere below them), globs
+    and file names into a sorted list of log files.
+    """
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.update(glob.glob(os.path.join(pattern, '**', 'log*.csv'), recursive=True))
+        else:
+            paths.update(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+    return sorted(paths)
+
+
+def group_of(path):
+    """Returns the group ID in a log<groupID>.csv file name, else the file name."""
+    name = os.path.basename(path)
+    match = LOG_NAME.match(name)
+    return match.group(1) if match else name
+
+
+def analyse_logs(paths):
+    """Runs in a worker. Returns {group: MetricsEngine} for the logs in paths."""
+    groups = {}
+    for path in paths:
+        group = group_of(path)
+        if group not in groups:
+            groups[group] = MetricsEngine()
+        try:
+            groups[group].add_log(path)
+        except (OSError, KeyError, csv.Error) as e:
+            print('Skipped {}: {}'.format(path, e))
+    return groups
+
+
+def analyse(paths, jobs=None):
+    """Returns ({group: MetricsEngine}, MetricsEngine of all logs).
+    With jobs=1 logs are analysed in this process.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    # A few chunks per worker, so workers finishing early pick up more
+    n_chunks = min(len(paths), jobs * 4)
+    chunks = [paths[i::n_chunks] for i in range(n_chunks)]
+
+    groups = {}
+    if jobs == 1:
+        merge_results(groups, map(analyse_logs, chunks))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            merge_results(groups, executor.map(analyse_logs, chunks))
+
+    total = MetricsEngine()
+    for engine in groups.values():
+        total.merge(engine)
+    return groups, total
+
+
+def merge_results(groups, results):
+    for result in results:
+        for group, engine in result.items():
+            if group in groups:
+                groups[group].merge(engine)
+            else:
+                groups[group] = engine
+
+
+def ranking(rows):
+    """rows are (name, moves, accuracy, median, p95). Sorts by
+    accuracy, best first, then by median time_delta.
+    """
+    return sorted(rows, key=lambda row: (-row[2] if row[2] == row[2] else float('inf'), row[3]))
+
+
+def table(title, name, rows):
+    lines = [title, '{:>4}  {:<16}{:>7}{:>11}{:>10}{:>10}'.format('#', name, 'moves', 'accuracy', 'median', 'p95')]
+    for rank, row in enumerate(ranking(rows), 1):
+        lines.append('{:>4}  {:<16}{:>7}{:>10.1f}%{:>9.2f}s{:>9.2f}s'.format(rank, *row))
+    return '\n'.join(lines)
+
+
+def rows_of(summaries):
+    """Returns table rows of (name, summary) pairs, summary as returned by
+    MetricsEngine.summary() or one of its 'per_goal' entries.
+    """
+    rows = []
+    for name, summary in summaries:
+        time_delta = summary.get('time_delta', summary)
+        rows.append((name, summary['moves'], summary['accuracy'], time_delta['p50'], time_delta['p95']))
+    return rows
+
+
+def report(groups, total, per_group_moves=False):
+    """Returns the summary and ranking tables as printable text. If
+    per_group_moves, moves are also ranked within each group.
+    """
+    summary = total.summary()
+    tables = [table('Summary', '', rows_of([('All groups', summary)])),
+              table('Groups', 'group', rows_of((group, engine.summary()) for group, engine in groups.items())),
+              table('Moves', 'move', rows_of(summary['per_goal'].items()))]
+    if per_group_moves:
+        for group, engine in sorted(groups.items()):
+            tables.append(table('Moves of group {}'.format(group), 'move',
+                                rows_of(engine.summary()['per_goal'].items())))
+    tables.append('Mean voltage {:.2f}, mean current {:.2f}, mean power {:.2f}'.format(
+        summary['mean_voltage'], summary['mean_current'], summary['mean_power']))
+    return '\n\n'.join(tables)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Metrics of many evaluation logs')
+    parser.add_argument('paths', nargs='+', help='log files, directories or globs')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--per-group', action='store_true', help='also rank moves within each group')
+    args = parser.parse_args()
+
+    paths = find_logs(args.paths)
+    if not paths:
+        parser.error('No logs found')
+    groups, total = analyse(paths, args.jobs)
+    print('{} logs, {} groups'.format(len(paths), len(groups)))
+    print(report(groups, total, args.per_group))
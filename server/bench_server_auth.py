@@ -0,0 +1,57 @@
+"""
+Per-message decrypt and parse cost of server_auth.MessageDecoder against the
+previous server_auth.decryptText. Both create an AES-CBC cipher per message.
+The previous version split the text five times and stripped padding without
+checking it. MessageDecoder checks the padding and splits once.
+`python bench_server_auth.py` prints the time per message and the message rate
+one server process can keep up with.
+"""
+
+import base64
+import os
+import timeit
+
+from Crypto.Cipher import AES
+
+from server_auth import MessageDecoder, server_auth
+
+
+KEY = '0123456789abcdef'
+MESSAGE = b'#wipers|4.98|512|2549|1234.5'
+
+
+def decrypt_per_message(cipherText, Key):
+    """Previous server_auth.decryptText: five splits, padding stripped."""
+    decodedMSG = base64.b64decode(cipherText)
+    iv = decodedMSG[:16]
+    secret_key = bytes(str(Key), encoding = "utf8")
+    cipher = AES.new(secret_key,AES.MODE_CBC,iv)
+    decryptedText = cipher.decrypt(decodedMSG[16:]).strip()
+    decryptedTextStr = decryptedText.decode('utf8')
+    decryptedTextStr1 = decryptedTextStr[decryptedTextStr.find('#'):]
+    decryptedTextFinal = bytes(decryptedTextStr1[1:],'utf8').decode('utf8')
+    action = decryptedTextFinal.split('|')[0]
+    voltage = decryptedTextFinal.split('|')[1]
+    current = decryptedTextFinal.split('|')[2]
+    power = decryptedTextFinal.split('|')[3]
+    cumpower = decryptedTextFinal.split('|')[4]
+    return {'action': action, 'voltage': voltage, 'current': current, 'power': power, 'cumpower': cumpower}
+
+
+def bench(label, stmt, number):
+    secs = timeit.timeit(stmt, number=number)
+    print('{:<40}{:>10.2f} us/message {:>10.0f} messages/s'.format(label, secs / number * 1e6, number / secs))
+
+
+if __name__ == '__main__':
+    number = 20000
+    pad = AES.block_size - len(MESSAGE) % AES.block_size
+    iv = os.urandom(16)
+    cipherText = base64.b64encode(iv + AES.new(KEY.encode(), AES.MODE_CBC, iv).encrypt(MESSAGE + bytes((pad,)) * pad))
+    auth = server_auth()
+    decoder = MessageDecoder(KEY)
+
+    print('Message: {} ({} bytes)'.format(MESSAGE.decode(), len(MESSAGE)))
+    bench('previous decryptText (five splits)', lambda: decrypt_per_message(cipherText, KEY), number)
+    bench('server_auth.decryptText', lambda: auth.decryptText(cipherText, KEY), number)
+    bench('MessageDecoder.decode (one split)', lambda: decoder.decode(cipherText), number)
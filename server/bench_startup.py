@@ -0,0 +1,44 @@
+"""
+Import time of the server modules, from `python -X importtime`.
+`python bench_startup.py [module ...]` imports each module (default: the
+servers and performanceMetrics) in a fresh interpreter and prints the total
+import time and the slowest imports it pulled in, so heavy imports that slow
+down restarting the server between groups show up.
+"""
+
+import os
+import subprocess
+import sys
+
+
+MODULES = ['final_eval_server', 'async_eval_server', 'performanceMetrics']
+TOP = 8
+
+
+def import_times(module):
+    """Returns {package: cumulative microseconds} for the imports of module."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    children = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:  # Imported directly by the next top-level module listed
+            children[name.strip()] = int(cumulative)
+        elif depth == 0:
+            if name.strip() == module:
+                children[module] = int(cumulative)
+                return children
+            children = {}
+    raise ValueError('{} not found in -X importtime output'.format(module))
+
+
+if __name__ == '__main__':
+    for module in sys.argv[1:] or MODULES:
+        times = import_times(module)
+        print('{:<30}{:>10.1f} ms'.format(module, times.pop(module) / 1000))
+        for name, us in sorted(times.items(), key=lambda item: -item[1])[:TOP]:
+            print('    {:<26}{:>10.1f} ms'.format(name, us / 1000))
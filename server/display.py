@@ -0,0 +1,74 @@
+"""
+Displays for the action dancers should perform next.
+
+Server.get_action calls display.show(text, token) from whichever thread gives
+the action. Once the text is on screen the display calls
+on_render(token, timestamp), so the server can log how long after the action
+was set it was actually shown (render_delay in the log).
+"""
+
+import queue
+import sys
+import time
+
+
+class TkDisplay:
+    def __init__(self, on_render=None, text='', poll_ms=10):
+        """Full-screen label in a Tk window. show() only queues the text, as Tk
+        must be used from the thread that created it. run() drains the queue
+        every poll_ms milliseconds with Tk's after() scheduler, so new actions
+        appear within poll_ms without busy-waiting.
+        """
+        from tkinter import Label, Tk  # Slow to import, and not needed by headless servers
+
+        self.on_render = on_render
+        self.poll_ms = poll_ms
+        self.queue = queue.Queue()
+        self.window = Tk()
+        self.label = Label(self.window, text=text)
+        self.label.config(font=('times', 130, 'bold'))
+        self.label.pack(expand=True)
+        self._done = None
+
+    def show(self, text, token=None):
+        """Thread-safe."""
+        self.queue.put((text, token))
+
+    def run(self, done):
+        """Runs the Tk main loop on the calling thread until done() returns True."""
+        self._done = done
+        self.window.after(0, self._drain)
+        self.window.mainloop()
+
+    def _drain(self):
+        latest = None
+        while True:  # Only the latest text is drawn if several are waiting
+            try:
+                latest = self.queue.get_nowait()
+            except queue.Empty:
+                break
+        if latest is not None:
+            text, token = latest
+            self.label.config(text=text)
+            self.window.update_idletasks()  # Redraw now rather than when the loop is next idle
+            if self.on_render is not None:
+                self.on_render(token, time.time())
+
+        if self._done():
+            self.window.destroy()
+        else:
+            self.window.after(self.poll_ms, self._drain)
+
+
+class HeadlessDisplay:
+    def __init__(self, on_render=None, file=sys.stdout):
+        """Prints each action to file (eg a terminal projected to the dancers)
+        as soon as it is given. Needs no display server.
+        """
+        self.on_render = on_render
+        self.file = file
+
+    def show(self, text, token=None):
+        print('DISPLAY :: {}'.format(text), file=self.file, flush=True)
+        if self.on_render is not None:
+            self.on_render(token, time.time())
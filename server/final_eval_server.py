@@ -1,24 +1,26 @@
 # Changing the actions in self.actions should automatically change the script to function with the new number of moves.
 # Developed and improved by past CG3002 TAs and students: Tean Zheng Yang, Jireh Tan, Boyd Anderson,  Paul Tan, Bernard Tan Ke Xuan, Ashley Ong
 
-import os
 import random
 import socket
 import sys
 import threading
 import time
-from tkinter import Label, Tk
-
-import numpy as np
-import pandas as pd
 
+from action_log import ActionLog
+from display import HeadlessDisplay, TkDisplay
+from message_framing import MessageReassembler
+from metrics import MetricsEngine
 from server_auth import server_auth
 
 
 class Server(threading.Thread):
 
-    def __init__(self, ip_addr, port_num):
+    def __init__(self, ip_addr, port_num, framed=False, binary_log=False, display=None):
         threading.Thread.__init__(self)
+        self.display = display  # Shows each new action, see display.py
+        self.framed = framed  # Clients send length-prefixed messages, see message_framing.py
+        self.binary_log = binary_log  # Also log to log<groupID>.bin, see action_log.py
         self.shutdown = threading.Event()
 
         # init server
@@ -45,14 +47,13 @@ class Server(threading.Thread):
         #           'cowboy', 'cowboy', 'cowboy', 'cowboy']
 
         self.n_moves = len(self.actions)
-        self.indices = np.arange(self.n_moves)
+        self.indices = list(range(self.n_moves))
         self.filename = "logServer.csv"
-        self.columns = ['timestamp', 'action', 'goal', 'time_delta', 'correct', 'voltage', 'current', 'power',
-                        'cumpower']
-        self.df = pd.DataFrame(columns=self.columns)
-        self.df = self.df.set_index('timestamp')
+        self.log = None
+        self.metrics = MetricsEngine()  # Updated live as moves are logged
         self.action = None
         self.action_set_time = None
+        self.action_shown_time = None  # When the display showed the current action
         self.x = 0
         self.timeout = 30
         self.no_response = False
@@ -84,46 +85,58 @@ class Server(threading.Thread):
             print("AES key must be either 16, 24, or 32 bytes long")
             self.stop()
 
+        reassembler = MessageReassembler(self.framed)
         while not self.shutdown.is_set():
             data = self.connection.recv(1024)
             if data:
-                try:
-                    msg = data.decode("utf8")
-                    decodedmsg = self.auth.decryptText(msg, secret_key)
-
-                    if decodedmsg['action'] == "logout":
-                        self.logout = True
-                        print("bye bye")
-                        self.stop()
-                    elif len(decodedmsg['action']) == 0:
-                        print('action len 0')
-                        pass
-                    elif self.action is None:  # Ignore if no action has been set yet
-                        print('no action set')
-                        pass
-                    else:  # If action is available log it, and then...
-                        print('action available')
-                        self.no_response = False
-                        self.log_move_made(decodedmsg['action'], decodedmsg['voltage'], decodedmsg['current'],
-                                           decodedmsg['power'], decodedmsg['cumpower'])
-                        print("{} :: {} :: {} :: {} :: {}".format(decodedmsg['action'], decodedmsg['voltage'],
-                                                                  decodedmsg['current'], decodedmsg['power'],
-                                                                  decodedmsg['cumpower']))
-
-                        self.get_action()  # Get new action
-
-                except Exception as e:
-                    print(e)
+                for msg in reassembler.feed(data):
+                    self.handle_message(msg, secret_key)
+                    if self.shutdown.is_set():
+                        break
 
             else:
                 print('no more data from', client_address, file=sys.stderr)
                 self.stop()
 
 
+    def handle_message(self, data, secret_key):
+        try:
+            msg = data.decode("utf8")
+            decodedmsg = self.auth.decryptText(msg, secret_key)
+
+            if decodedmsg['action'] == "logout":
+                self.logout = True
+                print("bye bye")
+                self.stop()
+            elif len(decodedmsg['action']) == 0:
+                print('action len 0')
+                pass
+            elif self.action is None:  # Ignore if no action has been set yet
+                print('no action set')
+                pass
+            else:  # If action is available log it, and then...
+                print('action available')
+                self.no_response = False
+                self.log_move_made(decodedmsg['action'], decodedmsg['voltage'], decodedmsg['current'],
+                                   decodedmsg['power'], decodedmsg['cumpower'])
+                print("{} :: {} :: {} :: {} :: {}".format(decodedmsg['action'], decodedmsg['voltage'],
+                                                          decodedmsg['current'], decodedmsg['power'],
+                                                          decodedmsg['cumpower']))
+
+                self.get_action()  # Get new action
+
+        except Exception as e:
+            print(e)
+
+
     def stop(self):
         self.connection.close()
         self.shutdown.set()
         self.timer.cancel()
+        if self.log is not None:
+            self.log.close()
+        if self.metrics.n_moves:
+            print(self.metrics.report('Group {}'.format(groupID)))
 
 
     def get_action(self):
@@ -140,72 +153,72 @@ class Server(threading.Thread):
         self.action = self.actions[index]
         self.x += 1
         self.action_set_time = time.time()
+        self.action_shown_time = None
 
         print("NEW ACTION :: {}".format(self.action))
+        if self.display is not None:
+            if self.x == self.n_moves + 1:
+                self.display.show(str(self.x) + ":" + 'logout', self.x)
+            else:
+                self.display.show(str(self.x) + ":" + str(self.action), self.x)
 
         self.timer = threading.Timer(self.timeout, self.get_action)
         self.no_response = True
         self.timer.start()
 
 
-    def log_move_made(self, action_made, voltage, current, power, cumpower):
-        file = "log" + str(groupID) + ".csv"
-
-        if not os.path.isfile(file):
-            with open(file, 'w') as f:
-                self.df.to_csv(f)
+    def action_rendered(self, x, timestamp):
+        """Called by the display once action number x is on screen."""
+        if x == self.x:
+            self.action_shown_time = timestamp
 
-        with open(file, 'a') as f:
-            data = dict()
-            data['timestamp'] = time.time()
-            data['action'] = action_made
-            data['goal'] = self.action
-            data['time_delta'] = data['timestamp'] - self.action_set_time
-            data['voltage'] = voltage
-            data['current'] = current
-            data['power'] = power
-            data['cumpower'] = cumpower
-            data['correct'] = (self.action == action_made)
 
-            self.df = pd.DataFrame(data, index=[0])[self.columns].set_index('timestamp')
-            self.df.to_csv(f, header=False)
+    def log_move_made(self, action_made, voltage, current, power, cumpower):
+        timestamp = time.time()
+        time_delta = timestamp - self.action_set_time
+        correct = self.action == action_made
+        shown_time = self.action_shown_time
+        render_delay = shown_time - self.action_set_time if shown_time is not None else ''
+        try:  # A failed write must not stop the next action from being given
+            if self.log is None:
+                binary_path = "log" + str(groupID) + ".bin" if self.binary_log else None
+                self.log = ActionLog("log" + str(groupID) + ".csv", binary_path=binary_path, names=self.actions)
+            self.log.write(timestamp, action_made, self.action, time_delta, correct, voltage, current, power,
+                           cumpower, render_delay)
+        except (OSError, ValueError) as e:
+            print('Could not log move: {}'.format(e))
+        self.metrics.add(action_made, self.action, time_delta, correct, voltage, current, power)
 
 
 
 if __name__ == '__main__':
-    if len(sys.argv) != 4:
+    flags = sys.argv[4:]
+    if len(sys.argv) < 4 or not set(flags) <= {'--framed', '--binlog', '--headless'}:
         print('Invalid number of arguments')
-        print('python server.py [IP address] [Port] [groupID]')
+        print('python server.py [IP address] [Port] [groupID] [--framed] [--binlog] [--headless]')
+        print('--framed expects length-prefixed messages from the client')
+        print('--binlog also writes a binary log, log<groupID>.bin')
+        print('--headless prints actions instead of opening the display window')
         sys.exit()
 
     ip_addr = sys.argv[1]
     port_num = int(sys.argv[2])
     groupID = sys.argv[3]
+    framed = '--framed' in flags
 
     # IP address = 'x.x.x.x'
     # Port = 8888
 
-    my_server = Server(ip_addr, port_num)
-    my_server.start()
-
-    # Create action display window
-    display_window = Tk()
-    display_label = Label(display_window, text=str(my_server.action))
-    display_label.config(font=('times', 130, 'bold'))
-    display_label.pack(expand=True)
-    display_window.update()
-
-    while my_server.x <= my_server.n_moves + 1 and not my_server.shutdown.is_set():  # Display new task
-        if my_server.x == my_server.n_moves + 1:
-            display_label.config(text=str(my_server.x) + ":" + 'logout')
-
-            if my_server.logout is True:
-                break
+    my_server = Server(ip_addr, port_num, framed, '--binlog' in flags)
 
-        else:
-            display_label.config(text=str(my_server.x) + ":" + str(my_server.action))
-
-        display_window.update()
+    if '--headless' in flags:  # Actions are only printed, so Tk is never imported
+        my_server.display = HeadlessDisplay(my_server.action_rendered)
+        my_server.start()
+        my_server.join()
+        sys.exit()
 
-        time.sleep(0.2)
+    # Create action display window. It is updated as soon as get_action queues a new action
+    my_server.display = TkDisplay(my_server.action_rendered, text=str(my_server.action))
+    my_server.start()
+    my_server.display.run(lambda: my_server.shutdown.is_set() or my_server.x > my_server.n_moves + 1)
 
@@ -0,0 +1,41 @@
+import struct
+
+
+# Each framed message is preceded by its length as an unsigned 16-bit big-endian int
+LENGTH_PREFIX = struct.Struct('>H')
+
+
+def frame_message(message):
+    return LENGTH_PREFIX.pack(len(message)) + message
+
+
+class MessageReassembler:
+
+    def __init__(self, framed=True):
+        """Splits the bytes received on a connection into messages.
+        If framed, messages are length-prefixed (see frame_message), so one
+        recv() may return several messages and a message may be split across
+        recv() calls. Otherwise every recv() is taken to be exactly one message,
+        as sent by clients without framing.
+        """
+        self.framed = framed
+        self.buf = bytearray()
+
+
+    def feed(self, data):
+        """Returns the list of complete messages (bytes) received so far."""
+        if not self.framed:
+            return [bytes(data)]
+
+        self.buf += data
+        messages = []
+        start = 0
+        while len(self.buf) - start >= LENGTH_PREFIX.size:
+            length, = LENGTH_PREFIX.unpack_from(self.buf, start)
+            end = start + LENGTH_PREFIX.size + length
+            if end > len(self.buf):
+                break
+            messages.append(bytes(self.buf[start + LENGTH_PREFIX.size:end]))
+            start = end
+        del self.buf[:start]
+        return messages
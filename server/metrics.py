@@ -0,0 +1,235 @@
+"""
+Incremental performance metrics over evaluation logs.
+
+MetricsEngine is updated one move at a time, either live by the servers as
+moves are logged or from log<groupID>.csv files, and keeps only running sums,
+confusion counts and quantile sketches. Memory therefore does not grow with the
+number of moves, and engines built from different logs can be merged.
+
+`python metrics.py <log.csv> [log.csv ...]` prints the metrics of each log and,
+for more than one log, of all of them together.
+"""
+
+import csv
+import math
+import os
+import sys
+from collections import Counter
+
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+class QuantileSketch:
+    def __init__(self, relative_accuracy=0.01, min_value=1e-6):
+        """Mergeable quantile sketch for non-negative values (DDSketch).
+        Values are counted in logarithmic buckets, so quantile() is within
+        relative_accuracy of the exact value and memory grows with
+        log(max / min) of the values added, not with their count. Values below
+        min_value are counted as 0.
+        """
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = Counter()   # Bucket i holds values in (gamma ** (i - 1), gamma ** i]
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value, count=1):
+        if value < self.min_value:
+            self.zero_count += count
+        else:
+            self.buckets[math.ceil(math.log(value) / self._log_gamma)] += count
+        self.count += count
+
+    def merge(self, other):
+        if other.gamma != self.gamma or other.min_value != self.min_value:
+            raise ValueError('Cannot merge sketches with different accuracy')
+        self.buckets.update(other.buckets)
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q):
+        """Returns the q-quantile (0 <= q <= 1) of the values added, or nan if
+        there are none.
+        """
+        if not self.count:
+            return float('nan')
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for i in sorted(self.buckets):
+            seen += self.buckets[i]
+            if rank < seen:
+                return 2 * self.gamma ** i / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class RunningStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def add(self, value):
+        if value != value:  # Skip nan
+            return
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else float('nan')
+
+
+class LatencyStats:
+    def __init__(self, relative_accuracy=0.01):
+        """Running mean/min/max and sketched quantiles of time_delta."""
+        self.stats = RunningStats()
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def add(self, value):
+        if value != value:
+            return
+        self.stats.add(value)
+        self.sketch.add(value)
+
+    def merge(self, other):
+        self.stats.merge(other.stats)
+        self.sketch.merge(other.sketch)
+
+    def summary(self):
+        summary = {'mean': self.stats.mean, 'min': self.stats.min, 'max': self.stats.max}
+        for q in QUANTILES:
+            summary['p{:g}'.format(q * 100)] = self.sketch.quantile(q)
+        return summary
+
+
+class MetricsEngine:
+    def __init__(self, relative_accuracy=0.01):
+        """Metrics of the moves added so far: accuracy, time_delta statistics
+        and mean voltage/current/power, overall and per goal action, and
+        confusion counts of (goal, action made). Timeouts, logged with action
+        'None', count as incorrect moves.
+        """
+        self.relative_accuracy = relative_accuracy
+        self.n_moves = 0
+        self.n_correct = 0
+        self.confusion = Counter()   # (goal, action made) -> moves
+        self.latency = LatencyStats(relative_accuracy)
+        self.goal_latency = {}       # goal -> LatencyStats
+        self.voltage = RunningStats()
+        self.current = RunningStats()
+        self.power = RunningStats()
+
+    def add(self, action, goal, time_delta, correct, voltage, current, power):
+        """Adds one move. Numeric arguments may be strings, as logged."""
+        self.n_moves += 1
+        self.n_correct += bool(correct)
+        self.confusion[goal, action] += 1
+        time_delta = _to_float(time_delta)
+        self.latency.add(time_delta)
+        if goal not in self.goal_latency:
+            self.goal_latency[goal] = LatencyStats(self.relative_accuracy)
+        self.goal_latency[goal].add(time_delta)
+        self.voltage.add(_to_float(voltage))
+        self.current.add(_to_float(current))
+        self.power.add(_to_float(power))
+
+    def add_log(self, path):
+        """Adds every move in a CSV log, reading it one row at a time. Returns
+        the number of moves added.
+        """
+        n_moves = self.n_moves
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                self.add(row['action'], row['goal'], row['time_delta'], row['correct'] in ('True', '1'),
+                         row['voltage'], row['current'], row['power'])
+        return self.n_moves - n_moves
+
+    def merge(self, other):
+        self.n_moves += other.n_moves
+        self.n_correct += other.n_correct
+        self.confusion.update(other.confusion)
+        self.latency.merge(other.latency)
+        for goal, latency in other.goal_latency.items():
+            if goal not in self.goal_latency:
+                self.goal_latency[goal] = LatencyStats(self.relative_accuracy)
+            self.goal_latency[goal].merge(latency)
+        self.voltage.merge(other.voltage)
+        self.current.merge(other.current)
+        self.power.merge(other.power)
+
+    @property
+    def accuracy(self):
+        """Percentage of moves that were correct."""
+        return self.n_correct / self.n_moves * 100 if self.n_moves else float('nan')
+
+    def goal_accuracy(self, goal):
+        moves = sum(count for (g, _), count in self.confusion.items() if g == goal)
+        return self.confusion[goal, goal] / moves * 100 if moves else float('nan')
+
+    def summary(self):
+        return {
+            'moves': self.n_moves,
+            'accuracy': self.accuracy,
+            'time_delta': self.latency.summary(),
+            'mean_voltage': self.voltage.mean,
+            'mean_current': self.current.mean,
+            'mean_power': self.power.mean,
+            'per_goal': {goal: dict(latency.summary(), accuracy=self.goal_accuracy(goal),
+                                    moves=latency.stats.count)
+                         for goal, latency in sorted(self.goal_latency.items())},
+        }
+
+    def report(self, title):
+        """Returns the summary as printable text."""
+        summary = self.summary()
+        time_delta = summary['time_delta']
+        lines = [title,
+                 '    Moves:          {}'.format(summary['moves']),
+                 '    Accuracy:       {:.1f} %'.format(summary['accuracy']),
+                 '    Time delta:     mean {mean:.2f} s, median {p50:.2f} s, p95 {p95:.2f} s, '
+                 'p99 {p99:.2f} s, min {min:.2f} s, max {max:.2f} s'.format(**time_delta),
+                 '    Mean voltage:   {:.2f}'.format(summary['mean_voltage']),
+                 '    Mean current:   {:.2f}'.format(summary['mean_current']),
+                 '    Mean power:     {:.2f}'.format(summary['mean_power'])]
+        for goal, stats in summary['per_goal'].items():
+            made = ', '.join('{} {}'.format(action, count) for (g, action), count in sorted(self.confusion.items())
+                             if g == goal)
+            lines.append('    {:<14}  {:>3} moves, {:5.1f} % correct, median {:.2f} s, p95 {:.2f} s  ({})'.format(
+                goal, stats['moves'], stats['accuracy'], stats['p50'], stats['p95'], made))
+        return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('python metrics.py <log.csv> [log.csv ...]')
+        sys.exit()
+
+    total = MetricsEngine()
+    for path in sys.argv[1:]:
+        engine = MetricsEngine()
+        engine.add_log(path)
+        print(engine.report(os.path.basename(path)))
+        total.merge(engine)
+    if len(sys.argv) > 2:
+        print(total.report('All logs'))
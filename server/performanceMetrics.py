@@ -6,8 +6,6 @@ This is a temporary script file.
 """
 
 from __future__ import division
-import pandas as pd
-import numpy as np
 import sys
 
 
@@ -15,32 +13,38 @@ import sys
 feature_columns = ['timestamp','action','goal','time_delta','correct','voltage','current','power']
 
 def read_data(file_path):
+    import pandas as pd  # Slow to import, so only when a log is read
     columns = ['timestamp','action','goal','time_delta','correct','voltage','current','power']
     data = pd.read_csv(file_path)
     data = data[columns]
     return data
 
 def calcuateMeanTime(logData):
+    import numpy as np
     timeDelay = logData["time_delta"]
     #print (np.mean(timeDelay))
     return np.mean(timeDelay)
 
 def calculateMedianTime(logData):
+    import numpy as np
     timeDelay = logData["time_delta"]
     #print np.median(timeDelay);
     return np.median(timeDelay)
 
 def calculateMaxTime(logData):
+    import numpy as np
     timeDelay = logData["time_delta"]
     #print np.max(timeDelay);
     return np.max(timeDelay)
 
 def calculateMinTime(logData):
+    import numpy as np
     timeDelay = logData["time_delta"]
     #print np.min(timeDelay);
     return np.min(timeDelay)
 
 def percentageAccuracy(logData):
+    import numpy as np
     correct = logData["correct"]
     correctIdentify = np.count_nonzero(correct == 1)
     falseIdentify = np.count_nonzero(correct == 0)
@@ -49,14 +53,17 @@ def percentageAccuracy(logData):
     return percentAccuracy
 
 def calculateMeanPower(logData):
+    import numpy as np
     power = logData["power"]
     return np.mean(power)
 
 def calculateMeanCurrent(logData):
+    import numpy as np
     current = logData["current"]
     return np.mean(current)
 
 def calculateMeanVoltage(logData):
+    import numpy as np
     voltage = logData["voltage"]
     return np.mean(voltage)
     
@@ -64,8 +71,7 @@ def main():
 #    file_path='log.csv'
     file_path=sys.argv[1]
     dataset = read_data(file_path)
-    data = dataset[feature_columns]
-    logData = pd.DataFrame(data, columns=feature_columns)
+    logData = dataset[feature_columns]
     
     meanTime = calcuateMeanTime(logData)
     print('Mean Time:               '+ str(meanTime))
@@ -2,30 +2,61 @@ from Crypto.Cipher import AES
 import base64
 import sys
 import os
+from collections import namedtuple
 
-class server_auth:
-    def __init__(self):
-        super(server_auth, self).__init__()
 
-    def decryptText(self, cipherText, Key):
-        decodedMSG = base64.b64decode(cipherText)
-        #print(decodedMSG)
-        iv = decodedMSG[:16]
-        #print(iv)
-        secret_key = bytes(str(Key), encoding = "utf8")
-        cipher = AES.new(secret_key,AES.MODE_CBC,iv)
-        decryptedText = cipher.decrypt(decodedMSG[16:]).strip()
-        decryptedTextStr = decryptedText.decode('utf8')
-        decryptedTextStr1 = decryptedTextStr[decryptedTextStr.find('#'):] 
-        decryptedTextFinal = bytes(decryptedTextStr1[1:],'utf8').decode('utf8')
-        action = decryptedTextFinal.split('|')[0]
-        voltage = decryptedTextFinal.split('|')[1]
-        current = decryptedTextFinal.split('|')[2]
-        power = decryptedTextFinal.split('|')[3]
-        cumpower = decryptedTextFinal.split('|')[4]
-        return {'action': action, 'voltage': voltage, 'current': current, 'power': power, 'cumpower': cumpower}
+Message = namedtuple('Message', 'action voltage current power cumpower')
+
+
+class MessageDecoder:
+    def __init__(self, key):
+        """Decrypts base64(iv + AES-CBC ciphertext) messages from clients and
+        parses '#action|voltage|current|power|cumpower' into a Message.
+        Padding is checked rather than stripped, and the fields are split in
+        one pass. key is the group's AES key, as str or bytes.
+        """
+        if isinstance(key, str):
+            key = key.encode('utf8')
+        self.key = key
 
+    def decode(self, cipherText):
+        """cipherText is base64 bytes or str. Raises ValueError if the message
+        is malformed.
+        """
+        data = base64.b64decode(cipherText)
+        n = len(data) - AES.block_size
+        if n <= 0 or n % AES.block_size:
+            raise ValueError('Ciphertext length {} is not a whole number of blocks'.format(len(data)))
+        plain = AES.new(self.key, AES.MODE_CBC, data[:AES.block_size]).decrypt(data[AES.block_size:])
+        text = _unpad(plain).decode('utf8')
 
+        start = text.find('#')
+        if start < 0:
+            raise ValueError('Message has no #: {!r}'.format(text))
+        fields = text[start + 1:].split('|', 5)
+        if len(fields) < 5:
+            raise ValueError('Message has {} fields, expected 5: {!r}'.format(len(fields), text))
+        return Message(fields[0], fields[1], fields[2], fields[3], fields[4])
 
 
+def _unpad(plain):
+    pad = plain[-1]
+    if 1 <= pad <= AES.block_size:  # PKCS#7, as rpi/client.py pads
+        if plain[-pad:] != bytes((pad,)) * pad:
+            raise ValueError('Invalid padding')
+        return plain[:-pad]
+    if pad in b' \0':  # Clients that pad with spaces or NULs
+        return plain.rstrip(b' \0')
+    raise ValueError('Invalid padding')
 
+
+class server_auth:
+    def __init__(self):
+        super(server_auth, self).__init__()
+        self.decoders = {}  # MessageDecoder per key, so decryptText keeps its (cipherText, Key) interface
+
+    def decryptText(self, cipherText, Key):
+        decoder = self.decoders.get(Key)
+        if decoder is None:
+            decoder = self.decoders[Key] = MessageDecoder(bytes(str(Key), encoding = "utf8"))
+        return decoder.decode(cipherText)._asdict()
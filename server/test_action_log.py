@@ -0,0 +1,90 @@
+import csv
+import os
+import tempfile
+import time
+import unittest
+
+from action_log import HEADER, LOG_COLUMNS, MAGIC, RECORD, VERSION, ActionLog, read_binary_log
+
+
+class TestActionLog(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'log1.csv')
+        self.binary_path = os.path.join(self.tmp.name, 'log1.bin')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_rows(self):
+        with open(self.path) as f:
+            return list(csv.reader(f))
+
+    def test_append(self):
+        for action in ('wipers', 'chicken'):
+            log = ActionLog(self.path, binary_path=self.binary_path, names=['wipers', 'wipers', 'chicken'])
+            log.write(100.0, action, 'wipers', 1.5, action == 'wipers', '4.98', '512', '2549', 'x',
+                      0.25 if action == 'wipers' else '')
+            log.close()
+            log.close()
+        rows = self.read_rows()
+        assert(rows[0] == LOG_COLUMNS)    # Header written once
+        assert(rows[1] == ['100.0', 'wipers', 'wipers', '1.5', 'True', '4.98', '512', '2549', 'x', '0.25'])
+        assert(rows[2][1] == 'chicken' and rows[2][4] == 'False' and rows[2][9] == '')
+
+        names, records = read_binary_log(self.binary_path)
+        assert(names == ['wipers', 'chicken', 'None'])
+        assert(list(records['action']) == [0, 1] and list(records['goal']) == [0, 0])
+        assert(list(records['correct']) == [1, 0] and records['power'][0] == 2549)
+        assert(records['time_delta'][1] == 1.5 and records['cumpower'][0] != records['cumpower'][0])  # nan
+        assert(records['render_delay'][0] == 0.25 and records['render_delay'][1] != records['render_delay'][1])
+
+        log = ActionLog(self.path, binary_path=self.binary_path, names=['chicken'])   # Other actions
+        log.close()
+        assert(read_binary_log(self.binary_path)[0] == ['chicken', 'None'])
+        assert(read_binary_log(self.binary_path[:-len('.bin')] + '.v1.bin')[0] == ['wipers', 'chicken', 'None'])
+
+    def test_old_columns(self):
+        with open(self.path, 'w', newline='') as f:
+            f.write(','.join(LOG_COLUMNS[:-1]) + '\r\n' + '99.0,None,wipers,30.0,False,0,0,0,0\r\n')
+        log = ActionLog(self.path)
+        log.write(100.0, 'wipers', 'wipers', 1.5, True, 0, 0, 0, 0, 0.25)
+        log.close()
+        rows = self.read_rows()
+        assert(rows[0] == LOG_COLUMNS[:-1])
+        assert(rows[2] == ['100.0', 'wipers', 'wipers', '1.5', 'True', '0', '0', '0', '0'])
+
+    def test_other_columns(self):
+        with open(self.path, 'w') as f:
+            f.write('time,action\n')
+        log = ActionLog(self.path)
+        log.close()
+        assert(self.read_rows() == [LOG_COLUMNS])
+        with open(os.path.join(self.tmp.name, 'log1.v1.csv')) as f:
+            assert(f.read() == 'time,action\n')
+
+    def test_old_binary_version(self):
+        names = b'wipers,None'
+        with open(self.binary_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION + 1, 2, 64) + names.ljust(64 - HEADER.size, b'\0'))
+            f.write(bytes(RECORD.size))
+        rotated = os.path.join(self.tmp.name, 'log1.v1.bin')
+
+        log = ActionLog(self.path, binary_path=self.binary_path, names=['wipers'])
+        log.write(101.0, 'wipers', 'wipers', 2.5, True, 0, 0, 0, 0, 0.25)
+        log.close()
+        with self.assertRaises(ValueError):
+            read_binary_log(rotated)
+        names, records = read_binary_log(self.binary_path)
+        assert(len(records) == 1 and records['render_delay'][0] == 0.25)
+
+    def test_timer_flush(self):
+        log = ActionLog(self.path, flush_interval=0.01)
+        log.write(100.0, 'None', 'wipers', 30.0, False, 0, 0, 0, 0)
+        time.sleep(0.1)
+        assert(len(self.read_rows()) == 2)    # Flushed before close
+        log.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import asyncio
+import base64
+import csv
+import os
+import tempfile
+import unittest
+
+from Crypto.Cipher import AES
+
+from async_eval_server import GroupSession, read_groups
+from message_framing import frame_message
+
+
+KEY = '0123456789abcdef'
+
+
+def encrypt(action, key=KEY):
+    plain = '#{}|4.9|0.5|2.45|10.1'.format(action).encode()
+    plain += b' ' * (-len(plain) % 16)
+    iv = os.urandom(16)
+    return base64.b64encode(iv + AES.new(key.encode(), AES.MODE_CBC, iv).encrypt(plain))
+
+
+class TestAsyncEvalServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_read_groups(self):
+        path = os.path.join(self.tmp.name, 'groups.txt')
+        with open(path, 'w') as f:
+            f.write('# groupID port key\n\n2 8002 {}\n3 8003 {}\n'.format(KEY, KEY * 2))
+        assert(read_groups(path) == [('2', 8002, KEY), ('3', 8003, KEY * 2)])
+
+        with open(path, 'w') as f:
+            f.write('2 8002 short\n')
+        with self.assertRaises(ValueError):
+            read_groups(path)
+
+    def test_independent_sessions(self):
+        async def run():
+            sessions = [GroupSession(g, KEY, actions=['wipers'], timeout=0.05, framed=True,
+                                     log_dir=self.tmp.name) for g in ('1', '2')]
+            for session in sessions:
+                await session.start('127.0.0.1', 0)
+            await asyncio.sleep(0.08)                     # First action given, none sent yet
+            _, writer = await asyncio.open_connection('127.0.0.1', sessions[0].port)
+            writer.write(frame_message(encrypt('wipers')) + frame_message(encrypt('logout')))
+            await writer.drain()
+            await asyncio.wait_for(sessions[0].done, 1)
+            writer.close()
+            assert(not sessions[1].done.done())
+            await asyncio.sleep(0.05)                     # Second group times out
+            sessions[1].stop()
+            return sessions
+
+        sessions = asyncio.run(run())
+        assert(sessions[0].logout and not sessions[1].logout)
+
+        with open(os.path.join(self.tmp.name, 'log1.csv')) as f:
+            rows = list(csv.reader(f))
+        assert(rows[0][:3] == ['timestamp', 'action', 'goal'])
+        assert(len(rows) == 2 and rows[1][1:3] == ['wipers', 'wipers'] and rows[1][4] == 'True')
+
+        with open(os.path.join(self.tmp.name, 'log2.csv')) as f:
+            rows = list(csv.reader(f))
+        assert(len(rows) >= 2 and rows[1][1] == 'None')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+
+from action_log import ActionLog
+from batch_metrics import analyse, find_logs, group_of, report
+from metrics import MetricsEngine
+
+
+class TestBatchMetrics(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.paths = []
+        for i, session in enumerate(('day1', 'day2', os.path.join('day2', 'late'))):
+            os.makedirs(os.path.join(self.tmp.name, session))
+            for group in ('1', '2', '3'):
+                path = os.path.join(self.tmp.name, session, 'log{}.csv'.format(group))
+                log = ActionLog(path)
+                for j in range(10 + i):
+                    goal = ('wipers', 'chicken')[j % 2]
+                    action = goal if j % int(group) == 0 else 'None'
+                    log.write(0.0, action, goal, 1.0 + j, action == goal, '5', '0.5', '2.5', 0)
+                log.close()
+                self.paths.append(path)
+        with open(os.path.join(self.tmp.name, 'day1', 'notes.csv'), 'w') as f:
+            f.write('not a log\n')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_find_logs(self):
+        assert(find_logs([self.tmp.name]) == sorted(self.paths))
+        assert(find_logs([os.path.join(self.tmp.name, 'day*', 'log1.csv')]) == sorted(self.paths[0:6:3]))
+        assert(group_of(self.paths[4]) == '2' and group_of('notes.csv') == 'notes.csv')
+
+    def test_analyse(self):
+        expected = MetricsEngine()
+        for path in self.paths:
+            expected.add_log(path)
+
+        for jobs in (1, 2):
+            groups, total = analyse(find_logs([self.tmp.name]), jobs)
+            assert(sorted(groups) == ['1', '2', '3'])
+            assert(groups['1'].n_moves == 33 and groups['1'].accuracy == 100)
+            assert(total.summary() == expected.summary() and total.confusion == expected.confusion)
+
+        text = report(groups, total, per_group_moves=True)
+        lines = text.splitlines()
+        ranked = [line.split()[1] for line in lines[lines.index('Groups') + 2:lines.index('Groups') + 5]]
+        assert(ranked == ['1', '2', '3'])
+        assert('Moves of group 3' in text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import io
+import os
+import threading
+import unittest
+
+from display import HeadlessDisplay, TkDisplay
+
+
+class TestDisplay(unittest.TestCase):
+    def test_headless(self):
+        rendered = []
+        out = io.StringIO()
+        display = HeadlessDisplay(lambda token, timestamp: rendered.append(token), file=out)
+        display.show('1:wipers', 1)
+        assert(out.getvalue() == 'DISPLAY :: 1:wipers\n' and rendered == [1])
+
+    @unittest.skipUnless(os.environ.get('DISPLAY'), 'needs a display')
+    def test_tk(self):
+        rendered = []
+        display = TkDisplay(lambda token, timestamp: rendered.append((token, display.label.cget('text'))))
+        done = threading.Event()
+
+        def give_actions():
+            display.show('1:wipers', 1)
+            display.show('2:chicken', 2)   # Drawn together with 1, so only 2 is shown
+            threading.Timer(0.1, done.set).start()
+
+        threading.Thread(target=give_actions).start()
+        display.run(done.is_set)
+        assert(rendered[-1] == (2, '2:chicken'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,21 @@
+import unittest
+
+from message_framing import MessageReassembler, frame_message
+
+
+class TestMessageReassembler(unittest.TestCase):
+    def test_framed(self):
+        reassembler = MessageReassembler()
+        stream = frame_message(b'abc') + frame_message(b'') + frame_message(b'defgh')
+        assert(reassembler.feed(stream[:4]) == [])         # Split inside first message
+        assert(reassembler.feed(stream[4:9]) == [b'abc', b''])
+        assert(reassembler.feed(stream[9:]) == [b'defgh'])
+        assert(reassembler.buf == bytearray())
+
+    def test_unframed(self):
+        reassembler = MessageReassembler(framed=False)
+        assert(reassembler.feed(b'abc') == [b'abc'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import random
+import tempfile
+import unittest
+
+from action_log import ActionLog
+from metrics import MetricsEngine, QuantileSketch
+
+
+class TestQuantileSketch(unittest.TestCase):
+    def test_relative_accuracy(self):
+        values = [random.expovariate(0.5) for _ in range(5000)] + [0.0] * 10
+        sketch = QuantileSketch(0.01)
+        for value in values:
+            sketch.add(value)
+        values.sort()
+        for q in (0, 0.01, 0.5, 0.95, 0.99, 1):
+            exact = values[int(q * (len(values) - 1))]
+            assert(abs(sketch.quantile(q) - exact) <= 0.01 * exact + 1e-12)
+        assert(len(sketch.buckets) < 2000)
+
+    def test_merge(self):
+        a, b, both = QuantileSketch(), QuantileSketch(), QuantileSketch()
+        for i in range(1, 101):
+            (a if i % 2 else b).add(i)
+            both.add(i)
+        a.merge(b)
+        assert(a.count == 100 and a.buckets == both.buckets)
+        assert(QuantileSketch().quantile(0.5) != QuantileSketch().quantile(0.5))   # nan when empty
+        with self.assertRaises(ValueError):
+            a.merge(QuantileSketch(0.05))
+
+
+class TestMetricsEngine(unittest.TestCase):
+    def test_live_and_log(self):
+        moves = [('wipers', 'wipers', 2.0, '5.0', '0.5', '2.5'),
+                 ('chicken', 'wipers', 4.0, '5.0', '0.5', '3.5'),
+                 ('None', 'chicken', 30.0, 0, 0, 0),
+                 ('chicken', 'chicken', 3.0, '4.0', 'bad', '1.0')]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'log1.csv')
+            log = ActionLog(path)
+            live = MetricsEngine()
+            for action, goal, time_delta, voltage, current, power in moves:
+                log.write(0.0, action, goal, time_delta, action == goal, voltage, current, power, 0)
+                live.add(action, goal, time_delta, action == goal, voltage, current, power)
+            log.close()
+            from_log = MetricsEngine()
+            assert(from_log.add_log(path) == 4)
+
+        for engine in (live, from_log):
+            summary = engine.summary()
+            assert(summary['moves'] == 4 and summary['accuracy'] == 50)
+            assert(summary['time_delta']['max'] == 30 and summary['time_delta']['mean'] == 39 / 4)
+            assert(abs(summary['time_delta']['p50'] - 3) < 0.03)
+            assert(summary['mean_current'] == 1 / 3)    # Unparsable value skipped
+            assert(summary['per_goal']['wipers']['accuracy'] == 50)
+            assert(engine.confusion['chicken', 'None'] == 1)
+        assert(live.summary() == from_log.summary())
+
+        live.merge(from_log)
+        assert(live.n_moves == 8 and live.confusion['wipers', 'chicken'] == 2)
+        assert(live.goal_latency['chicken'].stats.count == 4)
+        assert('chicken' in live.report('Both'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import base64
+import os
+import unittest
+
+from Crypto.Cipher import AES
+
+from server_auth import Message, MessageDecoder, server_auth
+
+
+KEY = '0123456789abcdef'
+
+
+def encrypt(plain, key=KEY):
+    iv = os.urandom(16)
+    return base64.b64encode(iv + AES.new(key.encode(), AES.MODE_CBC, iv).encrypt(plain))
+
+
+class TestMessageDecoder(unittest.TestCase):
+    def test_decode(self):
+        decoder = MessageDecoder(KEY)
+        message = b'#chicken|4.98|512|2549|1234.5'   # 29 bytes, so 2 blocks with padding
+        pkcs7 = encrypt(message + b'\x03' * 3)
+        assert(decoder.decode(pkcs7) == Message('chicken', '4.98', '512', '2549', '1234.5'))
+        assert(decoder.decode(pkcs7.decode()) == decoder.decode(pkcs7))
+        assert(decoder.decode(encrypt(message + b'   ')).cumpower == '1234.5')
+        assert(decoder.decode(encrypt(b'#' + b'\x10' * 15 + b'|1|2|3|4' + b'\x08' * 8)).action == '\x10' * 15)
+        assert(server_auth().decryptText(pkcs7, KEY) == Message('chicken', '4.98', '512', '2549', '1234.5')._asdict())
+
+    def test_invalid(self):
+        decoder = MessageDecoder(KEY)
+        for plain in (b'#chicken|4.98|512|2549|1234.5\x01\x02\x03',   # Bad padding
+                      b'#chicken|4.98|512|2549|1234.5\x00\x00\x11',
+                      b'#chicken|4.98|512|2549' + b'\n' * 10,    # 4 fields
+                      b'chicken|4.98|512|2549|1' + b'\t' * 9):    # No #
+            cipherText = encrypt(plain)
+            with self.assertRaises(ValueError):
+                decoder.decode(cipherText)
+        with self.assertRaises(ValueError):
+            decoder.decode(base64.b64encode(os.urandom(16)))   # iv only
+        with self.assertRaises(ValueError):
+            decoder.decode(base64.b64encode(os.urandom(40)))
+
+
+if __name__ == '__main__':
+    unittest.main()